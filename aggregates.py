@@ -0,0 +1,243 @@
+"""Agregações calculadas no banco em vez de no pandas.
+
+Três backends com a mesma interface:
+- SupabaseAggregates: lê as views de sql/finance_aggregates.sql e sql/habit_aggregates.sql pelo PostgREST;
+- SQLiteAggregates: roda as mesmas consultas em um SQLite local (testes e uso offline);
+- RollupAggregates: lê o resumo mensal persistido (sql/resumo_mensal.sql), mantido
+  pelo atualizar_db_finance.py, sem agregar nada na hora da consulta.
+
+Os métodos mensais devolvem DataFrames com a coluna 'mes' como pd.Period mensal; `habit_daily` e
+`daily_totals`, uma linha por dia com 'data_registro' em datetime64.
+"""
+import sqlite3
+import threading
+
+import pandas as pd
+
+from supabase_fetch import fetch_records
+
+
+HABIT_MONTHLY_COLUMNS = ['habito_id', 'dias_feitos', 'dias_com_nivel', 'soma_niveis']
+DAILY_TOTALS_COLUMNS = ['tipo_id', 'total', 'total_abs']
+
+
+def _with_month_period(rows, columns):
+    """Converte as linhas agregadas em DataFrame com 'mes' como Period('M')."""
+    df = pd.DataFrame.from_records(rows, columns=['mes'] + columns)
+    df['mes'] = pd.PeriodIndex(pd.to_datetime(df['mes']), freq='M')
+    return df
+
+
+def _with_day(rows, columns=('habitos_feitos',)):
+    """Linhas (data_registro, *columns) em DataFrame com a data em datetime64."""
+    df = pd.DataFrame.from_records(rows, columns=['data_registro', *columns])
+    df['data_registro'] = pd.to_datetime(df['data_registro'])
+    return df
+
+
+class SupabaseAggregates:
+    """Lê as agregações das views do Postgres (ver sql/finance_aggregates.sql e sql/habit_aggregates.sql)."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def monthly_totals(self):
+        """Soma de `financ_regis` por (mes, tipo_id): colunas total e total_abs."""
+        rows = fetch_records(self.client, 'financ_regis_mensal', columns='mes, tipo_id, total, total_abs',
+                             key=('mes', 'tipo_id'))
+        return _with_month_period(rows, ['tipo_id', 'total', 'total_abs'])
+
+    def daily_totals(self, since=None):
+        """Soma de `financ_regis` por (dia, tipo_id), a partir de `since`: colunas total e total_abs."""
+        filters = [('gte', 'data_registro', since)] if since else None
+        rows = fetch_records(self.client, 'financ_regis_diario', columns='data_registro, tipo_id, total, total_abs',
+                             key=('data_registro', 'tipo_id'), filters=filters)
+        return _with_day(rows, DAILY_TOTALS_COLUMNS)
+
+    def unpaid_installments(self):
+        """Soma das parcelas não pagas por mês de vencimento: coluna total."""
+        rows = fetch_records(self.client, 'parcelas_abertas_mensal', columns='mes, total', key='mes')
+        return _with_month_period(rows, ['total'])
+
+    def monthly_debt(self):
+        """Último saldo de `cc_e_dividas` de cada mês: coluna valor."""
+        rows = fetch_records(self.client, 'cc_e_dividas_mensal', columns='mes, valor', key='mes')
+        return _with_month_period(rows, ['valor'])
+
+    def reserve_balance(self):
+        """Saldo acumulado de `reserva` no fim de cada mês com registro: coluna saldo."""
+        rows = fetch_records(self.client, 'reserva_saldo_mensal', columns='mes, saldo', key='mes')
+        return _with_month_period(rows, ['saldo'])
+
+    def habit_monthly(self, since=None):
+        """Por (mes, habito_id): dias_feitos, dias_com_nivel e soma_niveis, a partir do mês de `since`."""
+        filters = [('gte', 'mes', since)] if since else None
+        rows = fetch_records(self.client, 'habitos_registros_mensal', key=('mes', 'habito_id'), filters=filters,
+                             columns='mes, habito_id, dias_feitos, dias_com_nivel, soma_niveis')
+        return _with_month_period(rows, HABIT_MONTHLY_COLUMNS)
+
+    def habit_daily(self, since=None):
+        """Por dia (a partir de `since`): habitos_feitos, hábitos ativos distintos com registro."""
+        filters = [('gte', 'data_registro', since)] if since else None
+        rows = fetch_records(self.client, 'habitos_registros_diario', columns='data_registro, habitos_feitos',
+                             key='data_registro', filters=filters)
+        return _with_day(rows)
+
+
+class RollupAggregates:
+    """Lê as tabelas de resumo mensal (sql/resumo_mensal.sql) mantidas pelo atualizar_db_finance.py."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def _summary(self, column, name):
+        """Coluna de `resumo_mensal` por mês, sem os meses em que ela é nula."""
+        rows = fetch_records(self.client, 'resumo_mensal', columns=f'mes, {column}', key='mes')
+        return _with_month_period([(row['mes'], row[column]) for row in rows if row[column] is not None], [name])
+
+    def monthly_totals(self):
+        rows = fetch_records(self.client, 'resumo_mensal_tipo', columns='mes, tipo_id, total, total_abs',
+                             key=('mes', 'tipo_id'))
+        return _with_month_period(rows, ['tipo_id', 'total', 'total_abs'])
+
+    def daily_totals(self, since=None):
+        # O resumo é mensal: os poucos dias do gráfico diário vêm de financ_regis, somados no SQLite
+        # com a mesma consulta da view financ_regis_diario (não depende de sql/finance_aggregates.sql)
+        filters = [('gte', 'data_registro', since)] if since else None
+        rows = fetch_records(self.client, 'financ_regis', columns='id, valor, tipo_id, data_registro', filters=filters)
+        return SQLiteAggregates.from_records({'financ_regis': rows}).daily_totals()
+
+    def unpaid_installments(self):
+        # Meses com faturas 0 (todas pagas) ficam de fora, como na view parcelas_abertas_mensal
+        df = self._summary('faturas_abertas', 'total')
+        return df[df['total'] != 0].reset_index(drop=True)
+
+    def monthly_debt(self):
+        return self._summary('divida', 'valor')
+
+    def reserve_balance(self):
+        return self._summary('reserva_saldo', 'saldo')
+
+
+class SQLiteAggregates:
+    """Mesmas agregações das views, sobre tabelas SQLite com as colunas do Supabase."""
+
+    MONTHLY_TOTALS_SQL = """
+        SELECT substr(data_registro, 1, 7) || '-01' AS mes, tipo_id,
+               SUM(valor) AS total, SUM(ABS(valor)) AS total_abs
+        FROM financ_regis
+        GROUP BY mes, tipo_id
+        ORDER BY mes, tipo_id
+    """
+    DAILY_TOTALS_SQL = """
+        SELECT substr(data_registro, 1, 10) AS data_registro, tipo_id,
+               SUM(valor) AS total, SUM(ABS(valor)) AS total_abs
+        FROM financ_regis
+        GROUP BY substr(data_registro, 1, 10), tipo_id
+        ORDER BY data_registro, tipo_id
+    """
+    UNPAID_INSTALLMENTS_SQL = """
+        SELECT substr(data_vencimento, 1, 7) || '-01' AS mes, SUM(valor_parcela) AS total
+        FROM compras_prazo_parcelas
+        WHERE pago = 0
+        GROUP BY mes
+        ORDER BY mes
+    """
+    MONTHLY_DEBT_SQL = """
+        SELECT mes, valor FROM (
+            SELECT substr(data_registro, 1, 7) || '-01' AS mes, valor,
+                   ROW_NUMBER() OVER (PARTITION BY substr(data_registro, 1, 7)
+                                      ORDER BY data_registro DESC, id DESC) AS rn
+            FROM cc_e_dividas
+        )
+        WHERE rn = 1
+        ORDER BY mes
+    """
+    HABIT_MONTHLY_SQL = """
+        SELECT substr(data_registro, 1, 7) || '-01' AS mes, habito_id,
+               COUNT(DISTINCT data_registro) AS dias_feitos,
+               COUNT(DISTINCT CASE WHEN nivel > 0 THEN data_registro END) AS dias_com_nivel,
+               COALESCE(SUM(nivel), 0) AS soma_niveis
+        FROM habitos_registros
+        GROUP BY mes, habito_id
+        ORDER BY mes, habito_id
+    """
+    HABIT_DAILY_SQL = """
+        SELECT substr(r.data_registro, 1, 10) AS data_registro, COUNT(DISTINCT r.habito_id) AS habitos_feitos
+        FROM habitos_registros r
+        JOIN habitos h ON h.id = r.habito_id
+        WHERE h.ativo = 1
+        GROUP BY substr(r.data_registro, 1, 10)
+        ORDER BY data_registro
+    """
+    RESERVE_BALANCE_SQL = """
+        SELECT substr(data_registro, 1, 7) || '-01' AS mes,
+               SUM(SUM(valor)) OVER (ORDER BY substr(data_registro, 1, 7)) AS saldo
+        FROM reserva
+        GROUP BY mes
+        ORDER BY mes
+    """
+
+    # Colunas de cada tabela lidas pelas consultas acima: criadas mesmo sem linhas, para a view vir vazia
+    SOURCE_COLUMNS = {
+        'financ_regis': ('id', 'valor', 'tipo_id', 'data_registro'),
+        'compras_prazo_parcelas': ('id', 'valor_parcela', 'data_vencimento', 'pago'),
+        'cc_e_dividas': ('id', 'valor', 'data_registro'),
+        'reserva': ('id', 'valor', 'data_registro'),
+        'habitos': ('id', 'ativo'),
+        'habitos_registros': ('id', 'habito_id', 'data_registro', 'nivel'),
+    }
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_records(cls, tables, path=":memory:"):
+        """Cria o SQLite a partir de {tabela: [dicts]} (ex.: fixtures ou dados já baixados)."""
+        conn = sqlite3.connect(path, check_same_thread=False)
+        with conn:
+            for table, records in tables.items():
+                columns = list(dict.fromkeys([*cls.SOURCE_COLUMNS.get(table, ()),
+                                              *(col for record in records for col in record)]))
+                if not columns:
+                    continue
+                conn.execute(f'CREATE TABLE IF NOT EXISTS {table} ({", ".join(columns)})')
+                placeholders = ", ".join("?" for _ in columns)
+                conn.executemany(f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders})',
+                                 [tuple(record.get(col) for col in columns) for record in records])
+        return cls(conn)
+
+    def _query(self, sql):
+        with self.lock:
+            return self.conn.execute(sql).fetchall()
+
+    def monthly_totals(self):
+        return _with_month_period(self._query(self.MONTHLY_TOTALS_SQL), ['tipo_id', 'total', 'total_abs'])
+
+    def daily_totals(self, since=None):
+        df = _with_day(self._query(self.DAILY_TOTALS_SQL), DAILY_TOTALS_COLUMNS)
+        if since:
+            df = df[df['data_registro'] >= pd.Timestamp(since)].reset_index(drop=True)
+        return df
+
+    def unpaid_installments(self):
+        return _with_month_period(self._query(self.UNPAID_INSTALLMENTS_SQL), ['total'])
+
+    def monthly_debt(self):
+        return _with_month_period(self._query(self.MONTHLY_DEBT_SQL), ['valor'])
+
+    def reserve_balance(self):
+        return _with_month_period(self._query(self.RESERVE_BALANCE_SQL), ['saldo'])
+
+    def habit_monthly(self, since=None):
+        df = _with_month_period(self._query(self.HABIT_MONTHLY_SQL), HABIT_MONTHLY_COLUMNS)
+        if since:
+            df = df[df['mes'] >= pd.Period(since, freq='M')].reset_index(drop=True)
+        return df
+
+    def habit_daily(self, since=None):
+        df = _with_day(self._query(self.HABIT_DAILY_SQL))
+        if since:
+            df = df[df['data_registro'] >= pd.Timestamp(since)].reset_index(drop=True)
+        return df
@@ -0,0 +1,117 @@
+"""Fluxo de caixa diário de `financ_regis`, calculado com np.bincount.
+
+Os lançamentos são distribuídos em um vetor por dia (ordinal do dia desde o primeiro
+lançamento) em uma única passada: um bincount para entradas e outro para saídas, em
+centavos (money.py). Saldo acumulado, ritmo de gastos e projeção do mês são leituras
+desses vetores, então a visão diária custa o mesmo que os totais mensais, com qualquer
+quantidade de anos de histórico. Com agregação no banco, os vetores saem das somas por
+(dia, tipo_id) de `aggregates.daily_totals`, só da janela que o gráfico diário usa.
+"""
+import calendar
+
+import numpy as np
+import pandas as pd
+
+from money import series_to_centavos
+
+# Janela (dias) do ritmo médio de gastos
+BURN_RATE_DAYS = 30
+
+
+class DailyCashflow:
+    """Entradas e saídas por dia (centavos int64), do primeiro ao último lançamento."""
+
+    def __init__(self, start, entradas, gastos):
+        self.start = start  # np.datetime64 (dia) do índice 0
+        self.entradas = entradas
+        self.gastos = gastos
+
+    @classmethod
+    def from_frame(cls, df, date_column='data_registro', cents_column='valor_centavos', entry_column='is_entrada'):
+        """Monta os vetores a partir do frame tipado de finance_schema.finance_frame."""
+        if df.empty:
+            return cls.empty()
+        cents = df[cents_column].to_numpy(dtype=np.int64)
+        is_entrada = df[entry_column].to_numpy(dtype=bool)
+        return cls._from_days(df[date_column], is_entrada, cents, np.abs(cents))
+
+    @classmethod
+    def from_aggregates(cls, daily_totals, entrada_id):
+        """Monta os vetores a partir das somas por (dia, tipo_id) já feitas no banco (aggregates.daily_totals)."""
+        if daily_totals.empty:
+            return cls.empty()
+        is_entrada = (daily_totals['tipo_id'] == entrada_id).to_numpy(dtype=bool)
+        return cls._from_days(daily_totals['data_registro'], is_entrada,
+                              series_to_centavos(daily_totals['total']).to_numpy(dtype=np.int64),
+                              series_to_centavos(daily_totals['total_abs']).to_numpy(dtype=np.int64))
+
+    @classmethod
+    def empty(cls):
+        return cls(None, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+    @classmethod
+    def _from_days(cls, dates, is_entrada, entrada_cents, gasto_cents):
+        """Distribui os valores por dia: entradas das linhas com `is_entrada`, gastos das demais."""
+        days = pd.to_datetime(dates).to_numpy().astype('datetime64[D]')
+        start = days.min()
+        ordinals = (days - start).astype(np.int64)
+        length = int(ordinals.max()) + 1
+
+        # Pesos float64 são exatos para somas de até 2^53 centavos; o resultado volta para int64
+        entradas = np.bincount(ordinals[is_entrada], weights=entrada_cents[is_entrada], minlength=length)
+        gastos = np.bincount(ordinals[~is_entrada], weights=gasto_cents[~is_entrada], minlength=length)
+        return cls(start, np.rint(entradas).astype(np.int64), np.rint(gastos).astype(np.int64))
+
+    def __len__(self):
+        return len(self.entradas)
+
+    def _index(self, day):
+        """Posição do dia no vetor (pode ficar fora de [0, len))."""
+        return int((np.datetime64(pd.Timestamp(day).date(), 'D') - self.start).astype(np.int64))
+
+    def _window(self, values, start, end):
+        """Valores de [start, end] (dias), com zeros fora do intervalo coberto pelos lançamentos."""
+        n_days = (pd.Timestamp(end).normalize() - pd.Timestamp(start).normalize()).days + 1
+        out = np.zeros(max(n_days, 0), dtype=np.int64)
+        if self.start is None or n_days <= 0:
+            return out
+        lo = self._index(start)
+        src_lo, src_hi = max(lo, 0), min(lo + n_days, len(values))
+        if src_lo < src_hi:
+            out[src_lo - lo:src_hi - lo] = values[src_lo:src_hi]
+        return out
+
+    def series(self, start, end):
+        """DataFrame diário (reais) de [start, end]: entradas, gastos, saldo do dia e saldo acumulado no período."""
+        entradas = self._window(self.entradas, start, end)
+        gastos = self._window(self.gastos, start, end)
+        net = entradas - gastos
+        return pd.DataFrame({
+            'entradas': entradas / 100,
+            'gastos': gastos / 100,
+            'saldo_dia': net / 100,
+            'saldo_acumulado': np.cumsum(net) / 100,
+        }, index=pd.date_range(pd.Timestamp(start).normalize(), periods=len(net), freq='D'))
+
+    def burn_rate(self, today, window_days=BURN_RATE_DAYS):
+        """Gasto médio diário (reais) nos `window_days` dias até `today`, inclusive."""
+        start = pd.Timestamp(today).normalize() - pd.Timedelta(days=window_days - 1)
+        return int(self._window(self.gastos, start, today).sum()) / 100 / window_days
+
+    def month_to_date(self, today):
+        """Entradas e gastos do mês até `today` e a projeção de fim de mês pelo ritmo atual."""
+        today = pd.Timestamp(today).normalize()
+        first = today.replace(day=1)
+        days_in_month = calendar.monthrange(today.year, today.month)[1]
+        elapsed = today.day
+        entradas = int(self._window(self.entradas, first, today).sum()) / 100
+        gastos = int(self._window(self.gastos, first, today).sum()) / 100
+        gastos_projetados = gastos / elapsed * days_in_month
+        return {
+            'entradas': entradas,
+            'gastos': gastos,
+            'dias_decorridos': elapsed,
+            'dias_no_mes': days_in_month,
+            'gastos_projetados': gastos_projetados,
+            'saldo_projetado': entradas - gastos_projetados,
+        }
@@ -0,0 +1,81 @@
+"""Matriz (mês × tipo_id) dos lançamentos de `financ_regis`, montada uma vez por execução.
+
+Os gráficos e totais da página de finanças perguntam sempre "quanto em tal mês, por
+categoria". Em vez de filtrar o DataFrame bruto a cada pergunta, os lançamentos são
+agrupados uma única vez (um groupby) em duas matrizes indexadas por Period('M'):
+- `total`: soma com sinal por categoria;
+- `total_abs`: soma dos valores absolutos (saídas são gravadas negativas).
+Cada consulta depois é uma leitura de linha, não uma varredura das transações.
+As matrizes guardam centavos (int64, ver money.py); os métodos devolvem reais.
+"""
+import pandas as pd
+
+from money import centavos_column, series_to_centavos
+
+
+class MonthlyPivot:
+    """Totais de `financ_regis` por (mês, tipo_id)."""
+
+    def __init__(self, total, total_abs):
+        # DataFrames int64 (centavos) com índice PeriodIndex mensal e uma coluna por tipo_id
+        self.total = total
+        self.total_abs = total_abs
+
+    @classmethod
+    def from_frame(cls, df, date_column='data_registro', value_column='valor', key_column='tipo_id'):
+        """Agrupa os lançamentos brutos em uma única passada."""
+        if df.empty:
+            return cls.empty()
+        cents_name = centavos_column(value_column)
+        cents = df[cents_name] if cents_name in df.columns else series_to_centavos(df[value_column])
+        grouped = pd.DataFrame({
+            'mes': pd.to_datetime(df[date_column]).dt.to_period('M'),
+            key_column: df[key_column],
+            'total': cents,
+            'total_abs': cents.abs(),
+        }).groupby(['mes', key_column], observed=True)[['total', 'total_abs']].sum()
+        return cls._from_long(grouped.reset_index(), key_column)
+
+    @classmethod
+    def from_aggregates(cls, monthly_totals):
+        """Monta a matriz a partir das linhas já agregadas no banco (aggregates.monthly_totals)."""
+        if monthly_totals.empty:
+            return cls.empty()
+        rows = monthly_totals.assign(total=series_to_centavos(monthly_totals['total']),
+                                     total_abs=series_to_centavos(monthly_totals['total_abs']))
+        return cls._from_long(rows, 'tipo_id')
+
+    @classmethod
+    def _from_long(cls, rows, key_column):
+        def matrix(values):
+            pivot = rows.pivot_table(index='mes', columns=key_column, values=values, aggfunc='sum', fill_value=0,
+                                     observed=True)
+            # tipo_id categórico (finance_schema) vira índice simples de colunas
+            pivot.columns = pd.Index(pivot.columns.tolist(), name='tipo_id')
+            return pivot.sort_index()
+        return cls(matrix('total'), matrix('total_abs'))
+
+    @classmethod
+    def empty(cls):
+        frame = pd.DataFrame(index=pd.PeriodIndex([], freq='M', name='mes'), dtype='int64')
+        return cls(frame, frame.copy())
+
+    @staticmethod
+    def _row(matrix, period):
+        if period not in matrix.index:
+            return pd.Series(dtype='int64')
+        return matrix.loc[period]
+
+    def expenses_by_category(self, period, entrada_id):
+        """Gastos do mês por categoria (valor absoluto da soma), do maior para o menor."""
+        row = self._row(self.total, period).drop(entrada_id, errors='ignore')
+        row = row[row != 0].abs()
+        return (row / 100).sort_values(ascending=False)
+
+    def month_totals(self, period, entrada_id):
+        """(total de entradas, total de saídas) do mês."""
+        total_row = self._row(self.total, period)
+        abs_row = self._row(self.total_abs, period)
+        entradas = int(total_row.get(entrada_id, 0))
+        gastos = int(abs_row.drop(entrada_id, errors='ignore').sum())
+        return entradas / 100, gastos / 100
@@ -0,0 +1,67 @@
+"""Esquema tipado dos DataFrames financeiros, montados uma vez por execução.
+
+Cada tabela vira um DataFrame compacto só com as colunas que o relatório usa:
+datas em datetime64, `tipo_id` categórico, dinheiro em centavos int64 (money.py) e
+booleanos de verdade. Os gráficos fatiam esses frames em vez de reconstruir listas e
+DataFrames ou converter datas de novo.
+"""
+import pandas as pd
+
+from money import series_to_centavos
+
+# {tabela: {coluna de saída: (coluna de origem, tipo)}}
+FINANCE_SCHEMAS = {
+    'financ_regis': {
+        'data_registro': ('data_registro', 'date'),
+        'tipo_id': ('tipo_id', 'category'),
+        'valor_centavos': ('valor', 'money'),
+    },
+    'compras_prazo_parcelas': {
+        'data_vencimento': ('data_vencimento', 'date'),
+        'valor_centavos': ('valor_parcela', 'money'),
+        'pago': ('pago', 'bool'),
+    },
+    'cc_e_dividas': {
+        'data_registro': ('data_registro', 'date'),
+        'valor_centavos': ('valor', 'money'),
+    },
+    'reserva': {
+        'data_registro': ('data_registro', 'date'),
+        'valor_centavos': ('valor', 'money'),
+    },
+}
+
+
+def _convert(values, kind):
+    if kind == 'date':
+        return pd.to_datetime(values) # no-op quando a busca já converteu (parse_dates)
+    if kind == 'money':
+        return series_to_centavos(values)
+    if kind == 'category':
+        return values.astype('category')
+    if kind == 'bool':
+        # Nulo conta como pago: o filtro `pago == False` das faturas também ignorava essas linhas
+        return values.astype(object).where(values.notna(), True).astype(bool)
+    raise ValueError(f"Tipo de coluna desconhecido: {kind}")
+
+
+def typed_frame(df, table):
+    """Converte o DataFrame bruto de `table` para o esquema tipado (FINANCE_SCHEMAS)."""
+    schema = FINANCE_SCHEMAS[table]
+    columns = {}
+    for output, (source, kind) in schema.items():
+        if source in df.columns:
+            values = df[source]
+        elif df.empty:
+            values = pd.Series([], dtype=object)
+        else:
+            raise KeyError(f"Coluna '{source}' ausente em '{table}'")
+        columns[output] = _convert(values.reset_index(drop=True), kind)
+    return pd.DataFrame(columns)
+
+
+def finance_frame(df, entrada_id):
+    """`financ_regis` tipado, com a partição entrada/saída em uma coluna booleana."""
+    frame = typed_frame(df, 'financ_regis')
+    frame['is_entrada'] = (frame['tipo_id'] == entrada_id).to_numpy(dtype=bool)
+    return frame
@@ -0,0 +1,249 @@
+"""Matriz (hábito × dia do ano) dos registros de `habitos_registros`, montada uma vez por execução.
+
+Taxas, ranking, tabela mensal e calendário perguntam sempre "o hábito X foi feito no dia D".
+Em vez de varrer a lista de registros (e converter datas) a cada pergunta, os registros do
+ano são espalhados em uma única passada em duas matrizes densas, uma linha por hábito e
+uma coluna por dia:
+- `done`: bool, há registro do hábito no dia (base das taxas de conclusão);
+- `levels`: `nivel` do registro (0 onde não há), usado pelo calendário e pelo resumo.
+Cada consulta depois é uma fatia de colunas e uma redução vetorizada (sum/mean/reduceat).
+As colunas podem começar em um ano anterior (`first_year`), para visões que cruzam a virada
+do ano (ex.: últimos 365 dias); as consultas por mês são sempre do ano do relatório.
+
+`HabitAggregateStats` responde as mesmas consultas por mês, e a conclusão diária da visão
+anual, a partir das contagens já agrupadas no servidor (views `habitos_registros_mensal` e
+`habitos_registros_diario`, aggregates.py), sem os registros diários.
+"""
+import calendar
+
+import numpy as np
+import pandas as pd
+
+
+class HabitMatrix:
+    """Registros de um ano por (hábito, dia), na ordem da lista de hábitos."""
+
+    def __init__(self, habit_ids, names, year, done, levels, recorded_days, first_year=None):
+        self.habit_ids = habit_ids
+        self.names = names
+        self.year = year
+        self.first_year = first_year or year
+        self.done = done                    # bool (n_hábitos, dias de first_year até o fim de year)
+        self.levels = levels                # int16 (n_hábitos, dias)
+        self.recorded_days = recorded_days  # bool (dias): algum registro no dia, de qualquer hábito
+        # Dia da coluna 0 e, para o ano do relatório, a coluna do dia 1 de cada mês e a após o fim do ano
+        self.origin = np.datetime64(f'{self.first_year}-01-01', 'D')
+        offset = int((np.datetime64(f'{year}-01-01', 'D') - self.origin).astype(np.int64))
+        self.month_starts = offset + np.cumsum([0] + [calendar.monthrange(year, m)[1] for m in range(1, 13)])
+
+    @classmethod
+    def from_records(cls, habits, registros, year, first_year=None):
+        """Monta as matrizes de `first_year` (padrão: `year`) até o fim de `year`, com as datas convertidas uma vez."""
+        first_year = first_year or year
+        habit_ids = [habit['id'] for habit in habits]
+        names = [habit['nome'] for habit in habits]
+        origin = np.datetime64(f'{first_year}-01-01', 'D')
+        n_days = int((np.datetime64(f'{year + 1}-01-01', 'D') - origin).astype(np.int64))
+        done = np.zeros((len(habits), n_days), dtype=bool)
+        levels = np.zeros((len(habits), n_days), dtype=np.int16)
+        recorded_days = np.zeros(n_days, dtype=bool)
+        if not registros:
+            return cls(habit_ids, names, year, done, levels, recorded_days, first_year)
+
+        df = pd.DataFrame.from_records(registros, columns=['habito_id', 'data_registro', 'nivel'])
+        days = pd.to_datetime(df['data_registro'], format='%Y-%m-%d').to_numpy().astype('datetime64[D]')
+        cols = (days - origin).astype(np.int64)
+        in_year = (cols >= 0) & (cols < n_days)
+        recorded_days[cols[in_year]] = True
+
+        # Linha de cada registro pela posição do hábito na lista (-1: hábito fora da lista)
+        rows = pd.Index(habit_ids).get_indexer(df['habito_id'])
+        keep = in_year & (rows >= 0)
+        rows, cols = rows[keep], cols[keep]
+        done[rows, cols] = True
+        # Registro repetido no mesmo dia: vale o último da lista, como no preenchimento antigo
+        levels[rows, cols] = pd.to_numeric(df['nivel'], errors='coerce').fillna(0).to_numpy(dtype=np.int16)[keep]
+        return cls(habit_ids, names, year, done, levels, recorded_days, first_year)
+
+    def __len__(self):
+        return len(self.habit_ids)
+
+    def days_in_month(self, month):
+        return int(self.month_starts[month] - self.month_starts[month - 1])
+
+    def _month_columns(self, month):
+        return slice(self.month_starts[month - 1], self.month_starts[month])
+
+    def month_levels(self, month):
+        """Níveis do mês: (n_hábitos, dias do mês)."""
+        return self.levels[:, self._month_columns(month)]
+
+    def rates(self, month):
+        """Taxa de conclusão (%) de cada hábito no mês: Series indexada pelo id do hábito."""
+        completed = self.done[:, self._month_columns(month)].sum(axis=1)
+        return pd.Series(completed / self.days_in_month(month) * 100, index=self.habit_ids, dtype=float)
+
+    def monthly_rates(self):
+        """Taxa (%) por hábito (linhas, pelo nome) e mês (colunas 'Jan'...'Dec'), em uma redução."""
+        # dtype explícito: em bool, add.reduceat faria 'ou' lógico em vez de contar
+        completed = np.add.reduceat(self.done[:, :self.month_starts[-1]], self.month_starts[:-1], axis=1,
+                                    dtype=np.int64)
+        return pd.DataFrame(completed / np.diff(self.month_starts) * 100, index=self.names,
+                            columns=list(calendar.month_abbr)[1:])
+
+    def overall_monthly_rates(self):
+        """Taxa geral (%) de cada mês: pares (hábito, dia) feitos / (hábitos × dias); NaN nos meses sem registro."""
+        completed = np.add.reduceat(self.done[:, :self.month_starts[-1]].sum(axis=0), self.month_starts[:-1])
+        possible = len(self) * np.diff(self.month_starts)
+        has_records = np.logical_or.reduceat(self.recorded_days[:self.month_starts[-1]], self.month_starts[:-1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = np.where(possible > 0, completed / possible * 100, 0.0)
+        rates = np.where(has_records, rates, np.nan)
+        return dict(zip(list(calendar.month_abbr)[1:], rates.tolist()))
+
+    def month_completed(self, month):
+        """Quantidade de (hábito, dia) do mês com nível > 0."""
+        return int((self.month_levels(month) > 0).sum())
+
+    def _column(self, day):
+        """Coluna de um dia (pode ficar fora da matriz)."""
+        return int((np.datetime64(pd.Timestamp(day).date(), 'D') - self.origin).astype(np.int64))
+
+    def daily_completion(self, end, days=365):
+        """Fração dos hábitos feitos em cada um dos `days` dias até `end` (inclusive): Series por data.
+
+        Dias antes da primeira coluna da matriz contam como 0.
+        """
+        end_col = self._column(end)
+        start_col = end_col - days + 1
+        counts = np.zeros(days, dtype=np.int64)
+        lo, hi = max(start_col, 0), min(end_col + 1, self.done.shape[1])
+        if lo < hi:
+            counts[lo - start_col:hi - start_col] = self.done[:, lo:hi].sum(axis=0)
+        fraction = counts / len(self) if len(self) else counts.astype(float)
+        dates = pd.date_range(pd.Timestamp(self.origin) + pd.Timedelta(days=start_col), periods=days, freq='D')
+        return pd.Series(fraction, index=dates)
+
+    @staticmethod
+    def _runs(mask):
+        """Run-length das sequências True de cada linha: (linha, coluna inicial, comprimento), em ordem."""
+        padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+        padded[:, 1:-1] = mask
+        edges = np.diff(padded, axis=1)
+        rows, starts = np.nonzero(edges == 1)
+        _, ends = np.nonzero(edges == -1)  # mesma ordem (linha, coluna) dos inícios
+        return rows, starts, ends - starts
+
+    def streaks(self, today, start=None):
+        """Sequências e pausas de cada hábito de `start` até `today` (inclusive), em dias: DataFrame indexado pelo id.
+
+        - atual: sequência que termina hoje, ou ontem (o dia de hoje ainda pode ser registrado);
+        - recorde: maior sequência na janela;
+        - maior_pausa / pausa_media: dias sem registro entre dois dias feitos da janela;
+        - sem_fazer: dias desde o último registro (0 se feito hoje).
+        A janela começa em `start` (padrão: a primeira coluna da matriz); sequências e pausas que
+        começam antes dela contam só a parte de dentro. Tudo sai de dois run-length encodings da
+        matriz `done`, para todos os hábitos de uma vez.
+        """
+        stop = max(min(self._column(today) + 1, self.done.shape[1]), 0)
+        begin = 0 if start is None else min(max(self._column(start), 0), stop)
+        done = self.done[:, begin:stop]
+        end = done.shape[1]
+        n = len(self)
+
+        rows, starts, lengths = self._runs(done)
+        recorde = np.zeros(n, dtype=np.int64)
+        np.maximum.at(recorde, rows, lengths)
+        alive = starts + lengths >= end - 1
+        atual = np.zeros(n, dtype=np.int64)
+        atual[rows[alive]] = lengths[alive]
+
+        gap_rows, gap_starts, gap_lengths = self._runs(~done)
+        # Pausas internas: nem antes do primeiro registro da janela, nem a que chega até hoje
+        interior = (gap_starts > 0) & (gap_starts + gap_lengths < end)
+        maior_pausa = np.zeros(n, dtype=np.int64)
+        np.maximum.at(maior_pausa, gap_rows[interior], gap_lengths[interior])
+        gap_count = np.bincount(gap_rows[interior], minlength=n)
+        gap_total = np.bincount(gap_rows[interior], weights=gap_lengths[interior], minlength=n)
+        pausa_media = np.divide(gap_total, gap_count, out=np.zeros(n), where=gap_count > 0)
+        trailing = gap_starts + gap_lengths == end
+        sem_fazer = np.zeros(n, dtype=np.int64)
+        sem_fazer[gap_rows[trailing]] = gap_lengths[trailing]
+
+        return pd.DataFrame({'atual': atual, 'recorde': recorde, 'maior_pausa': maior_pausa,
+                             'pausa_media': pausa_media, 'sem_fazer': sem_fazer}, index=self.habit_ids)
+
+
+class HabitAggregateStats:
+    """Contagens por (hábito, mês) do ano do relatório e por dia, com a interface mensal e diária de HabitMatrix."""
+
+    def __init__(self, habit_ids, names, year, done_days, level_days, level_sums, recorded_months, daily_done=None):
+        self.habit_ids = habit_ids
+        self.names = names
+        self.year = year
+        self.done_days = done_days              # int64 (n_hábitos, 12): dias com registro
+        self.level_days = level_days            # int64 (n_hábitos, 12): dias com nível > 0
+        self.level_sums = level_sums            # int64 (n_hábitos, 12): soma dos níveis
+        self.recorded_months = recorded_months  # bool (12): algum registro no mês, de qualquer hábito
+        self.daily_done = daily_done            # Series: hábitos ativos feitos por dia (índice de datas)
+        self.month_days = np.array([calendar.monthrange(year, m)[1] for m in range(1, 13)])
+
+    @classmethod
+    def from_aggregates(cls, habits, rows, year, daily=None):
+        """Monta as grades a partir de `habit_monthly()` (colunas mes, habito_id, dias_feitos, dias_com_nivel,
+        soma_niveis) e, se houver, a série diária de `habit_daily()` (data_registro, habitos_feitos)."""
+        habit_ids = [habit['id'] for habit in habits]
+        names = [habit['nome'] for habit in habits]
+        shape = (len(habits), 12)
+        grids = {column: np.zeros(shape, dtype=np.int64) for column in ('dias_feitos', 'dias_com_nivel', 'soma_niveis')}
+        recorded_months = np.zeros(12, dtype=bool)
+
+        rows = rows[rows['mes'].dt.year == year]
+        if len(rows):
+            months = rows['mes'].dt.month.to_numpy() - 1
+            recorded_months[months] = True
+            habit_rows = pd.Index(habit_ids).get_indexer(rows['habito_id'])
+            keep = habit_rows >= 0
+            for column, grid in grids.items():
+                grid[habit_rows[keep], months[keep]] = rows[column].to_numpy(dtype=np.int64)[keep]
+        daily_done = None
+        if daily is not None:
+            daily_done = pd.Series(daily['habitos_feitos'].to_numpy(dtype=np.int64),
+                                   index=pd.DatetimeIndex(daily['data_registro']).normalize())
+        return cls(habit_ids, names, year, grids['dias_feitos'], grids['dias_com_nivel'], grids['soma_niveis'],
+                   recorded_months, daily_done)
+
+    def __len__(self):
+        return len(self.habit_ids)
+
+    def days_in_month(self, month):
+        return int(self.month_days[month - 1])
+
+    def rates(self, month):
+        """Taxa de conclusão (%) de cada hábito no mês: Series indexada pelo id do hábito."""
+        return pd.Series(self.done_days[:, month - 1] / self.days_in_month(month) * 100, index=self.habit_ids,
+                         dtype=float)
+
+    def monthly_rates(self):
+        """Taxa (%) por hábito (linhas, pelo nome) e mês (colunas 'Jan'...'Dec')."""
+        return pd.DataFrame(self.done_days / self.month_days * 100, index=self.names,
+                            columns=list(calendar.month_abbr)[1:])
+
+    def overall_monthly_rates(self):
+        """Taxa geral (%) de cada mês; NaN nos meses sem registro."""
+        possible = len(self) * self.month_days
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = np.where(possible > 0, self.done_days.sum(axis=0) / possible * 100, 0.0)
+        rates = np.where(self.recorded_months, rates, np.nan)
+        return dict(zip(list(calendar.month_abbr)[1:], rates.tolist()))
+
+    def month_completed(self, month):
+        """Quantidade de (hábito, dia) do mês com nível > 0."""
+        return int(self.level_days[:, month - 1].sum())
+
+    def daily_completion(self, end, days=365):
+        """Fração dos hábitos feitos em cada um dos `days` dias até `end` (inclusive): Series por data."""
+        dates = pd.date_range(end=pd.Timestamp(end).normalize(), periods=days, freq='D')
+        counts = self.daily_done.reindex(dates, fill_value=0).to_numpy(dtype=np.int64)
+        fraction = counts / len(self) if len(self) else counts.astype(float)
+        return pd.Series(fraction, index=dates)
@@ -0,0 +1,48 @@
+"""Valores monetários como inteiros em centavos.
+
+Convenção do projeto: dinheiro chega do Supabase como número (reais, `numeric`) e é
+convertido uma vez, na borda, para centavos inteiros (int / int64). Somas, saldos e
+agrupamentos são feitos em centavos, sem arredondamento acumulado; a conversão de volta
+para reais só acontece ao gravar no banco ou ao exibir. Colunas em centavos levam o
+sufixo `_centavos` (ex.: `valor_centavos`).
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+import pandas as pd
+
+CENTAVOS_SUFFIX = "_centavos"
+
+
+def centavos_column(column):
+    """Nome da coluna em centavos correspondente a `column` ('valor' -> 'valor_centavos')."""
+    return f"{column}{CENTAVOS_SUFFIX}"
+
+
+def to_centavos(value):
+    """Converte um valor em reais (float, str, Decimal, int ou None) para centavos inteiros."""
+    if value is None:
+        return 0
+    # str() devolve a representação decimal mais curta do float (0.1 -> '0.1'), sem o erro binário
+    return int((Decimal(str(value)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_reais(centavos):
+    """Centavos -> reais (float) para gravar no banco ou plotar; exato até duas casas."""
+    return int(centavos) / 100
+
+
+def series_to_centavos(values):
+    """Versão vetorizada de `to_centavos` para uma coluna (reais -> int64, nulos viram 0)."""
+    values = pd.Series(values)
+    reais = pd.to_numeric(values, errors='coerce').fillna(0).to_numpy(dtype=float)
+    # rint corrige o erro binário da multiplicação (12.34 * 100 = 1233.999...)
+    return pd.Series(np.rint(reais * 100).astype(np.int64), index=values.index)
+
+
+def format_centavos(centavos, thousands=True):
+    """Formata centavos como '1,234.56' (mesmo padrão do f'{x:,.2f}' usado no relatório), sem float."""
+    centavos = int(centavos)
+    sign = "-" if centavos < 0 else ""
+    reais, cents = divmod(abs(centavos), 100)
+    return f"{sign}{reais:,}.{cents:02d}" if thousands else f"{sign}{reais}.{cents:02d}"
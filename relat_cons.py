@@ -3,6 +3,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.gridspec as gridspec
 import matplotlib.patches as patches
+from matplotlib.collections import PatchCollection
 from matplotlib.backends.backend_pdf import PdfPages
 from datetime import datetime, timedelta
 import calendar
@@ -10,6 +11,7 @@ import numpy as np
 from matplotlib.image import imread
 from dotenv import load_dotenv
 import os
+from functools import partial
 
 
 # Configurações regionais e monetárias
@@ -18,12 +20,25 @@ LOCALE = 'pt_BR'
 
 # Tenta importar Supabase e Postgrest
 try:
-    from supabase import create_client
+    from supabase import Client
     from postgrest.exceptions import APIError
 except ImportError:
     print("Dependências não instaladas. Instale com: pip install supabase postgrest")
     sys.exit(1)
 
+from supabase_fetch import (ColumnRegistry, FetchScheduler, fetch_dataframe, fetch_in_chunks, fetch_records,
+                            split_columns, unwrap)
+from sync_cache import SyncCache, DEFAULT_CACHE_PATH
+from supabase_client import get_client
+from supabase_exec import STATS, execute
+from aggregates import RollupAggregates, SupabaseAggregates
+from finance_pivot import MonthlyPivot
+from finance_schema import finance_frame, typed_frame
+from time_index import TimeTable
+from cashflow import BURN_RATE_DAYS, DailyCashflow
+from habit_matrix import HabitAggregateStats, HabitMatrix
+from table_render import draw_table, format_percent, format_scaled
+
 # --- CLASSE 1: FINANCE REPORT (Relatórios Financeiros) ---
 
 class FinanceReport:
@@ -92,8 +107,17 @@ class FinanceReport:
         return ax
     
     """Gera gráficos e tabelas de relatórios financeiros."""
-    def __init__(self, supabase_url, supabase_key):
-        self.supabase = create_client(supabase_url, supabase_key)
+    # Meses de faturas futuras projetados no gráfico de dívida (mês atual incluído)
+    INVOICE_HORIZON_MONTHS = 12
+
+    def __init__(self, supabase_url, supabase_key, cache=None, client=None, aggregates=None,
+                 invoice_horizon_months=INVOICE_HORIZON_MONTHS):
+        # Cliente injetado pelo orquestrador, ou o compartilhado (pool keep-alive) para url/chave
+        self.supabase = client or get_client(supabase_url, supabase_key)
+        self.cache = cache # SyncCache opcional: só baixa linhas novas/recentes
+        # Backend de agregação (aggregates.py) opcional: totais mensais calculados no banco
+        self.aggregates = aggregates
+        self.invoice_horizon_months = invoice_horizon_months
         self.colors = {
             'entry': '#39d353', 
             'expense': '#f85149', 
@@ -110,22 +134,103 @@ class FinanceReport:
         self.font_size = 9
         # CONSOLIDADO DE TABELAS (Tirado de fetch_all_data e centralizado)
         self.tables = ["tipo", "financ_regis", "cc_e_dividas", "reserva", "compras_prazo_parcelas"]
+        # Projeção: cada tabela é buscada só com as colunas que algum consumidor declarou
+        self.columns = ColumnRegistry(self.COLUMN_REQUIREMENTS)
+
+    # Colunas lidas por cada consumidor (o id da paginação é incluído automaticamente)
+    COLUMN_REQUIREMENTS = {
+        'process_results': {'tipo': ('id', 'nome_tipo'), 'financ_regis': ('tipo_id',)},
+        'create_monthly_expense_chart': {'tipo': ('id', 'nome_tipo'),
+                                         'financ_regis': ('valor', 'tipo_id', 'data_registro')},
+        'create_debt_and_invoice_chart': {'cc_e_dividas': ('valor', 'data_registro'),
+                                          'compras_prazo_parcelas': ('valor_parcela', 'data_vencimento', 'pago')},
+        'create_reserve_line_chart': {'reserva': ('valor', 'data_registro')},
+        'generate_finance_page': {'financ_regis': ('valor', 'data_registro')},
+        'create_daily_cashflow_chart': {'financ_regis': ('valor', 'tipo_id', 'data_registro')},
+    }
+
+    # Colunas de data convertidas já na busca, página a página
+    DATE_COLUMNS = {
+        'financ_regis': ('data_registro',),
+        'cc_e_dividas': ('data_registro',),
+        'reserva': ('data_registro',),
+        'compras_prazo_parcelas': ('data_vencimento',),
+    }
+
+    # Coluna da janela re-verificada no cache (pega edições recentes, ex.: parcela marcada como paga)
+    SYNC_WINDOW_COLUMNS = {
+        'financ_regis': 'data_registro',
+        'cc_e_dividas': 'data_registro',
+        'reserva': 'data_registro',
+        'compras_prazo_parcelas': 'data_vencimento',
+    }
+
+    def _fetch_table_df(self, table_name):
+        """Busca uma tabela como DataFrame, pelo cache incremental quando disponível."""
+        parse_dates = self.DATE_COLUMNS.get(table_name, ())
+        columns = self.columns.select(table_name)
+        if self.cache is None:
+            return fetch_dataframe(self.supabase, table_name, columns=columns, parse_dates=parse_dates)
+        return self.cache.sync_dataframe(self.supabase, table_name, columns=columns, parse_dates=parse_dates,
+                                         window_column=self.SYNC_WINDOW_COLUMNS.get(table_name),
+                                         window_start=self.cache.window_start())
+
+    def _fetch_table(self, table_name):
+        print(f"  -> Tentando buscar a tabela: {table_name}...")
+        if table_name == "tipo":
+            # Tabela pequena de categorias, consumida como lista de dicts
+            result = fetch_records(self.supabase, table_name, columns=self.columns.select(table_name))
+        else:
+            # Paginação keyset: o DataFrame é montado página a página
+            result = self._fetch_table_df(table_name)
+        print(f"  ✅ Tabela '{table_name}' buscada com sucesso. ({len(result)} registros)")
+        return result
+
+    # Com backend de agregação, financ_regis, cc_e_dividas, reserva e parcelas vêm já agrupados por mês
+    AGGREGATED_RAW_TABLES = ["tipo"]
+    AGGREGATE_QUERIES = ["monthly_totals", "unpaid_installments", "monthly_debt", "reserve_balance"]
+
+    def _raw_tables(self):
+        return self.AGGREGATED_RAW_TABLES if self.aggregates is not None else self.tables
+
+    @staticmethod
+    def cashflow_start(today):
+        """Primeiro dia lido pelo fluxo diário: início do mês anterior ou da janela do ritmo de gastos."""
+        today = pd.Timestamp(today).normalize()
+        previous_month = (today.replace(day=1) - pd.Timedelta(days=1)).replace(day=1)
+        return min(previous_month, today - pd.Timedelta(days=BURN_RATE_DAYS - 1))
+
+    def fetch_jobs(self):
+        """Buscas independentes (uma por tabela ou agregação) para o FetchScheduler."""
+        jobs = {f"finance:{table_name}": partial(self._fetch_table, table_name) for table_name in self._raw_tables()}
+        if self.aggregates is not None:
+            for name in self.AGGREGATE_QUERIES:
+                jobs[f"finance:agg:{name}"] = getattr(self.aggregates, name)
+            # Somas por (dia, tipo_id) só dos dias que o gráfico de fluxo diário mostra
+            since = self.cashflow_start(datetime.now()).strftime('%Y-%m-%d')
+            jobs["finance:agg:daily_totals"] = partial(self.aggregates.daily_totals, since=since)
+        return jobs
 
 # DENTRO DA CLASSE FinanceReport (SUBSTITUA A FUNÇÃO INTEIRA)
-    def fetch_all_data(self):
-        """Busca todos os dados financeiros, agora com a lista de tabelas consolidada e valida."""
+    def fetch_all_data(self, scheduler=None):
+        """Busca todos os dados financeiros, com as tabelas consultadas em paralelo."""
         print("Buscando dados financeiros do Supabase (Usando lista consolidada)...")
+        own_scheduler = scheduler is None
+        scheduler = scheduler or FetchScheduler()
+        try:
+            return self.process_results(scheduler.run(self.fetch_jobs()))
+        finally:
+            if own_scheduler:
+                scheduler.shutdown()
+
+    def process_results(self, results):
+        """Monta o dicionário de dados financeiros a partir dos resultados das buscas."""
         data = {}
-        # Lista Consolidada, Garantindo a inclusão das Parcelas
-        self.tables = ["tipo", "financ_regis", "cc_e_dividas", "reserva", "compras_prazo_parcelas"]
         table_name = "" # Variável para capturar a tabela com erro
         
         try:
-            for table_name in self.tables:
-                print(f"  -> Tentando buscar a tabela: {table_name}...")
-                response = self.supabase.table(table_name).select("*").execute()
-                data[table_name] = response.data
-                print(f"  ✅ Tabela '{table_name}' buscada com sucesso. ({len(data[table_name])} registros)")
+            for table_name in self._raw_tables():
+                data[table_name] = unwrap(results, f"finance:{table_name}")
 
             # --- Lógica de Processamento de Dados ---
             tipos_data = data.get('tipo', [])
@@ -136,22 +241,33 @@ class FinanceReport:
                 return None 
 
             entrada_id = entrada_tipo['id']
-            data['gastos'] = [r for r in data.get('financ_regis', []) if r.get('tipo_id') != entrada_id]
-            data['entradas'] = [r for r in data.get('financ_regis', []) if r.get('tipo_id') == entrada_id]
-
-            # Prepara o DataFrame de gastos
-            gastos_df = pd.DataFrame(data['gastos'])
-            if not gastos_df.empty:
-                gastos_df['data_registro'] = pd.to_datetime(gastos_df['data_registro'])
-            data['gastos_df'] = gastos_df
-
-            # NOVO: Prepara o DataFrame de parcelas futuras (compras_prazo_parcelas)
-            parcelas_df = pd.DataFrame(data.get('compras_prazo_parcelas', []))
-            if not parcelas_df.empty:
-                parcelas_df['data_vencimento'] = pd.to_datetime(parcelas_df['data_vencimento'])
-                # Coluna 'valor' na tabela de parcelas é 'valor_parcela'
-                parcelas_df = parcelas_df.rename(columns={'valor_parcela': 'valor'})
-            data['parcelas_df'] = parcelas_df # Armazena o DataFrame processado
+            data['entrada_id'] = entrada_id
+
+            if self.aggregates is not None:
+                for name in self.AGGREGATE_QUERIES:
+                    table_name = name
+                    data[name] = unwrap(results, f"finance:agg:{name}")
+                data['pivot'] = MonthlyPivot.from_aggregates(data['monthly_totals'])
+                table_name = "daily_totals"
+                data['cashflow'] = DailyCashflow.from_aggregates(unwrap(results, "finance:agg:daily_totals"), entrada_id)
+                return data
+
+            # Um frame tipado por tabela (finance_schema.py), montado uma vez: datas datetime64,
+            # dinheiro em centavos int64; os gráficos só fatiam esses frames
+            data['reserva'] = typed_frame(data['reserva'], 'reserva')
+
+            # tipo_id categórico e partição entrada/saída em 'is_entrada'; os recortes por mês e por dia
+            # saem do pivot e do fluxo diário abaixo, sem filtrar o frame
+            data['financ_regis'] = finance_frame(data['financ_regis'], entrada_id)
+
+            # Totais por (mês, tipo_id) em um único groupby; gráficos e resumo leem daqui
+            data['pivot'] = MonthlyPivot.from_frame(data['financ_regis'])
+            # Entradas e saídas por dia (np.bincount), para o gráfico de fluxo de caixa diário
+            data['cashflow'] = DailyCashflow.from_frame(data['financ_regis'])
+
+            data['cc_e_dividas'] = typed_frame(data['cc_e_dividas'], 'cc_e_dividas')
+            # Parcelas (compras_prazo_parcelas) com 'valor_parcela' já em 'valor_centavos'
+            data['parcelas_df'] = typed_frame(data.pop('compras_prazo_parcelas'), 'compras_prazo_parcelas')
 
             return data
         
@@ -163,58 +279,33 @@ class FinanceReport:
             print(f"❌ Erro inesperado ao buscar dados: {e}") 
             return None
 
-    def get_monthly_expenses_by_category(self, gastos_df, year, month):
-        """Calcula os gastos totais de um mês específico, agrupados por categoria."""
-        if gastos_df.empty:
-            return pd.Series(dtype=float)
-            
-        start_date = datetime(year, month, 1)
-        _, num_days = calendar.monthrange(year, month)
-        end_date = datetime(year, month, num_days, 23, 59, 59)
-
-        # Filtra os gastos do mês
-        month_filter = (gastos_df['data_registro'] >= start_date) & (gastos_df['data_registro'] <= end_date)
-        month_data = gastos_df[month_filter].copy()
+    def _future_invoices(self, data, current_date):
+        """Faturas do mês atual em diante (horizonte configurável), das agregações do banco quando disponíveis."""
+        if 'unpaid_installments' not in data:
+            return self.get_future_invoices(data.get('parcelas_df', pd.DataFrame()), current_date)
 
-        if month_data.empty:
-            return pd.Series(dtype=float)
+        unpaid = data['unpaid_installments'].set_index('mes')['total']
+        first = pd.Period(current_date, freq='M')
+        series = unpaid[(unpaid.index >= first) & (unpaid.index < first + self.invoice_horizon_months)]
+        return series[series > 0]
 
-        # Agrupa e soma por tipo de gasto
-        expenses_by_type = month_data.groupby('tipo_id')['valor'].sum().abs().sort_values(ascending=False)
-        return expenses_by_type
-    
 # DENTRO DA CLASSE FinanceReport (FUNÇÃO CORRIGIDA)
-    def get_future_invoices(self, parcelas_df, current_date):
-        """Calcula o total das faturas futuras para o mês atual e os próximos 11 meses."""
+    def get_future_invoices(self, parcelas_df, current_date, horizon=None):
+        """Calcula o total das faturas futuras para o mês atual e os próximos (horizonte - 1) meses."""
+        horizon = horizon or self.invoice_horizon_months
         if parcelas_df.empty:
             return pd.Series(dtype=float)
-        
-        future_invoices = {}
-        # MUDANÇA CRÍTICA: Começa de i=0 (Mês Atual) e vai até i=11 (Próximos 11 meses)
-        for i in range(0, 12): 
-            target_date = current_date + pd.DateOffset(months=i)
-            target_month = target_date.month
-            target_year = target_date.year
-            
-            # Definir o período do mês (do dia 1 até o último dia)
-            start_date = datetime(target_year, target_month, 1)
-            _, days_in_month = calendar.monthrange(target_year, target_month)
-            end_date = datetime(target_year, target_month, days_in_month, 23, 59, 59)
-
-            # Filtro: Data de vencimento DENTRO do mês e status 'pago' = False
-            month_filter = (parcelas_df['data_vencimento'] >= start_date) & \
-                           (parcelas_df['data_vencimento'] <= end_date) & \
-                           (parcelas_df['pago'] == False) 
-
-            # Usa a coluna 'valor' (que foi renomeada no fetch_all_data)
-            month_invoices = parcelas_df[month_filter]['valor'].sum()
-            
-            # Usa Period para indexar por mês e ano
-            period_key = pd.Period(year=target_year, month=target_month, freq='M')
-            future_invoices[period_key] = month_invoices
-            
-        # Filtra para remover meses sem valor
-        series = pd.Series(future_invoices)
+
+        # Uma única passada: parcelas não pagas agrupadas pelo deslocamento (em meses) do vencimento
+        first = pd.Period(current_date, freq='M')
+        unpaid = parcelas_df[parcelas_df['pago'].eq(False)]
+        offsets = unpaid['data_vencimento'].dt.to_period('M').array.asi8 - first.ordinal
+        in_horizon = (offsets >= 0) & (offsets < horizon)
+
+        # Soma em centavos (frame tipado do process_results); pesos float64 são exatos até 2^53 centavos
+        totals = np.bincount(offsets[in_horizon], weights=unpaid['valor_centavos'].to_numpy(dtype=float)[in_horizon],
+                             minlength=horizon)
+        series = pd.Series(totals / 100, index=pd.period_range(first, periods=horizon, freq='M'))
         # Retorna apenas meses com valores > 0
         return series[series > 0]
 
@@ -227,9 +318,9 @@ class FinanceReport:
         prev_month_date = datetime(year, month, 1) - timedelta(days=1)
         prev_year, prev_month = prev_month_date.year, prev_month_date.month
 
-        # 1. Calcular gastos do Mês Atual e do Mês Anterior
-        current_expenses = self.get_monthly_expenses_by_category(data['gastos_df'], year, month)
-        previous_expenses = self.get_monthly_expenses_by_category(data['gastos_df'], prev_year, prev_month)
+        # 1. Gastos do Mês Atual e do Mês Anterior (linhas da matriz mês × categoria)
+        current_expenses = data['pivot'].expenses_by_category(pd.Period(year=year, month=month, freq='M'), data['entrada_id'])
+        previous_expenses = data['pivot'].expenses_by_category(pd.Period(year=prev_year, month=prev_month, freq='M'), data['entrada_id'])
         
         tipos_map = {t['id']: t['nome_tipo'] for t in data.get('tipo', [])}
         
@@ -348,13 +439,13 @@ class FinanceReport:
         ax1.set_title("2. Dívida em Aberto e Faturas Futuras (R$)", fontsize=12, fontweight='bold', color=self.colors['default'], pad=10)
 
         # 1. Dados da Dívida em Aberto (Linha)
-        debt_df = pd.DataFrame(data.get('cc_e_dividas', []))
+        debt_df = data.get('cc_e_dividas', pd.DataFrame())
         
         # 2. Obter Faturas Futuras (Barras)
         today = datetime.now()
-        future_invoices = self.get_future_invoices(data.get('parcelas_df', pd.DataFrame()), today)
+        future_invoices = self._future_invoices(data, today)
         
-        has_debt_data = not debt_df.empty
+        has_debt_data = not debt_df.empty or not data.get('monthly_debt', pd.DataFrame()).empty
         has_invoice_data = not future_invoices.empty
 
         if not has_debt_data and not has_invoice_data:
@@ -365,10 +456,12 @@ class FinanceReport:
 
         # Processar Dívida Histórica
         monthly_debt_series = pd.Series(dtype=float)
-        if has_debt_data:
-            debt_df['data_registro'] = pd.to_datetime(debt_df['data_registro'])
-            debt_df['Mes_Ano'] = debt_df['data_registro'].dt.to_period('M')
-            monthly_debt_series = debt_df.groupby('Mes_Ano')['valor'].last()
+        if 'monthly_debt' in data:
+            monthly_debt_series = data['monthly_debt'].set_index('mes')['valor']
+        elif has_debt_data:
+            # Frame tipado: datas já em datetime64, valor em centavos
+            mes_ano = debt_df['data_registro'].dt.to_period('M')
+            monthly_debt_series = debt_df.groupby(mes_ano)['valor_centavos'].last() / 100
             
         # 3. Combinar todos os meses relevantes para o eixo X
         all_months_periods = pd.PeriodIndex([], freq='M') 
@@ -453,22 +546,21 @@ class FinanceReport:
         """Gráfico 3: Acúmulo de Reserva e Metas (Renomeado para 3)."""
         ax.set_title("3. Acúmulo de Reserva e Metas (R$)", fontsize=12, fontweight='bold', color=self.colors['default'], pad=10)
 
-        reserve_df = pd.DataFrame(data['reserva'])
-        if reserve_df.empty:
+        if 'reserve_balance' in data:
+            # Saldo de fim de mês já calculado (view ou resumo mensal)
+            monthly_balance = data['reserve_balance'].set_index('mes')['saldo'].astype(float)
+        else:
+            reserve_df = data['reserva'].sort_values('data_registro')
+            # Saldo acumulado em centavos inteiros: sem deriva de arredondamento ao longo dos anos
+            saldo_acumulado = reserve_df['valor_centavos'].cumsum() / 100
+            monthly_balance = saldo_acumulado.groupby(reserve_df['data_registro'].dt.to_period('M')).last()
+
+        if monthly_balance.empty:
             ax.text(0.5, 0.5, "Nenhum lançamento na reserva.", ha='center', va='center', color=self.colors['default'], transform=ax.transAxes)
             ax.set_xticks([]); ax.set_yticks([]); ax.grid(False)
             for spine in ax.spines.values(): spine.set_visible(False)
             return
 
-        reserve_df['data_registro'] = pd.to_datetime(reserve_df['data_registro'])
-        reserve_df = reserve_df.sort_values('data_registro')
-        
-        reserve_df['saldo_acumulado'] = reserve_df['valor'].cumsum()
-        
-        reserve_df['Mes_Ano'] = reserve_df['data_registro'].dt.to_period('M')
-        
-        monthly_balance = reserve_df.groupby('Mes_Ano')['saldo_acumulado'].last()
-        
         all_months = pd.period_range(start=monthly_balance.index.min(), end=pd.Period(datetime.now(), freq='M'), freq='M')
         monthly_balance = monthly_balance.reindex(all_months)
         
@@ -519,26 +611,66 @@ class FinanceReport:
         ax.grid(True, linestyle='--', alpha=0.3, color=self.colors['default'])
         for spine in ax.spines.values(): spine.set_visible(False)
         
+    def create_daily_cashflow_chart(self, fig, ax, data):
+        """Gráfico 4: Saldo acumulado dia a dia no mês atual (vs. mês anterior) e projeção de fim de mês."""
+        ax.set_title("4. Fluxo de Caixa Diário (R$)", fontsize=12, fontweight='bold', color=self.colors['default'], pad=10)
+
+        cashflow = data['cashflow']
+        if len(cashflow) == 0:
+            ax.text(0.5, 0.5, "Nenhum lançamento registrado.", ha='center', va='center', color=self.colors['default'],
+                    transform=ax.transAxes)
+            ax.set_xticks([]); ax.set_yticks([]); ax.grid(False)
+            for spine in ax.spines.values(): spine.set_visible(False)
+            return
+
+        today = pd.Timestamp(datetime.now()).normalize()
+        first_day = today.replace(day=1)
+        last_prev = first_day - pd.Timedelta(days=1)
+        current = cashflow.series(first_day, today)
+        previous = cashflow.series(last_prev.replace(day=1), last_prev)
+        mtd = cashflow.month_to_date(today)
+        burn_rate = cashflow.burn_rate(today)
+
+        # Gastos do dia (barras) e saldo acumulado do mês (linhas), no mesmo eixo
+        ax.bar(current.index.day, -current['gastos'], color=self.colors['expense'], alpha=0.35, width=0.7,
+               label="Gastos do dia", zorder=1)
+        ax.plot(previous.index.day, previous['saldo_acumulado'], color=self.colors['default'], alpha=0.5,
+                linestyle='--', linewidth=1.5, label=f"Saldo {calendar.month_abbr[last_prev.month]} (mês anterior)")
+        ax.plot(current.index.day, current['saldo_acumulado'], color=self.colors['entry'], marker='o', markersize=3,
+                linewidth=2, label=f"Saldo {calendar.month_abbr[today.month]} (mês atual)", zorder=3)
+
+        # Projeção: do saldo de hoje até o fim do mês, mantendo o ritmo de gastos do mês
+        if mtd['dias_decorridos'] < mtd['dias_no_mes']:
+            ax.plot([today.day, mtd['dias_no_mes']], [current['saldo_acumulado'].iloc[-1], mtd['saldo_projetado']],
+                    color=self.colors['future_invoice_bar'], linestyle=':', linewidth=2, label="Projeção (ritmo atual)")
+
+        ax.text(0.01, 0.04,
+                # '$' escapado: dois '$' no mesmo texto viram Mathtext
+                f"Ritmo de gastos (30d): R\\$ {burn_rate:,.2f}/dia | Gastos projetados no mês: R\\$ {mtd['gastos_projetados']:,.2f}",
+                transform=ax.transAxes, ha='left', va='bottom', color=self.colors['default'], fontsize=self.font_size - 1,
+                bbox=dict(boxstyle="round,pad=0.3", facecolor=self.colors['secondary_bg'], edgecolor=self.colors['border']))
+
+        ax.axhline(0, color=self.colors['border'], linewidth=1)
+        ax.set_xlim(0.5, 31.5)
+        ax.set_xlabel("Dia do mês", color=self.colors['default'], fontsize=self.font_size)
+        ax.set_ylabel("Valor (R$)", color=self.colors['default'], fontsize=self.font_size)
+        ax.tick_params(axis='x', colors=self.colors['default'])
+        ax.tick_params(axis='y', colors=self.colors['default'])
+        ax.legend(loc='best', facecolor=self.colors['secondary_bg'], edgecolor=self.colors['border'],
+                  labelcolor=self.colors['default'], fontsize=self.font_size - 1)
+        ax.grid(True, linestyle='--', alpha=0.3, color=self.colors['default'])
+        for spine in ax.spines.values(): spine.set_visible(False)
+
 # DENTRO DA CLASSE FinanceReport (SUBSTITUA A FUNÇÃO generate_finance_page)
     def generate_finance_page(self, data):
-        """Gera a figura de finanças (Página 2) com o resumo e os 3 gráficos solicitados."""
+        """Gera a figura de finanças (Página 2) com o resumo e os 4 gráficos (gastos, dívida, reserva e fluxo diário)."""
         today = datetime.now()
         current_year, current_month = today.year, today.month
         month_name = calendar.month_name[current_month]
         
         # 1. CÁLCULO DAS MÉTRICAS DO MÊS ATUAL
-        start_date = datetime(current_year, current_month, 1)
-        _, num_days = calendar.monthrange(current_year, current_month)
-        end_date = datetime(current_year, current_month, num_days, 23, 59, 59)
-
-        entradas_df = pd.DataFrame(data.get('entradas', []))
-        entradas_df['data_registro'] = pd.to_datetime(entradas_df['data_registro'])
-        entrada_filter = (entradas_df['data_registro'] >= start_date) & (entradas_df['data_registro'] <= end_date)
-        total_entradas = entradas_df[entrada_filter]['valor'].sum()
-
-        gastos_df = data['gastos_df']
-        gasto_filter = (gastos_df['data_registro'] >= start_date) & (gastos_df['data_registro'] <= end_date)
-        total_gastos = gastos_df[gasto_filter]['valor'].abs().sum()
+        total_entradas, total_gastos = data['pivot'].month_totals(pd.Period(year=current_year, month=current_month, freq='M'),
+                                                                  data['entrada_id'])
         
         total_balanco = total_entradas - total_gastos
 
@@ -582,9 +714,9 @@ class FinanceReport:
         # FIGURA 2: Página 2 do PDF (CONSOLIDADO FINANCEIRO)
         fig_page2 = plt.figure(figsize=(FIG_WIDTH, FIG_HEIGHT), facecolor=self.colors['background'])
         
-        # Grid: [1.0: Gastos Mensais, 1.0: Dívida, 1.0: Reserva] - 3 linhas!
-        gs_page2 = gridspec.GridSpec(3, 1, figure=fig_page2, hspace=0.45, wspace=0.2, 
-                                     height_ratios=[1.0, 1.0, 1.0])
+        # Grid: [1.0: Gastos Mensais, 1.0: Dívida, 1.0: Reserva, 1.0: Fluxo Diário] - 4 linhas!
+        gs_page2 = gridspec.GridSpec(4, 1, figure=fig_page2, hspace=0.5, wspace=0.2, 
+                                     height_ratios=[1.0, 1.0, 1.0, 1.0])
 
         fig_page2.suptitle("RELATÓRIO FINANCEIRO - CONSOLIDADO", fontsize=16, fontweight='bold', color=self.colors['default'], y=0.98)
         
@@ -599,6 +731,10 @@ class FinanceReport:
         # 3. Reserva
         ax_reserve = fig_page2.add_subplot(gs_page2[2], facecolor=self.colors['secondary_bg'])
         self.create_reserve_line_chart(fig_page2, ax_reserve, data)
+
+        # 4. Fluxo de Caixa Diário
+        ax_cashflow = fig_page2.add_subplot(gs_page2[3], facecolor=self.colors['secondary_bg'])
+        self.create_daily_cashflow_chart(fig_page2, ax_cashflow, data)
         
         # Chamada da função de rodapé atualizada
         add_footer(fig_page2, total_entradas, total_gastos, total_balanco, month_name)
@@ -614,8 +750,21 @@ class FinanceReport:
 
 class HabitTracker:
     """Gera o relatório visual de rastreamento de hábitos."""
-    def __init__(self, supabase_url, supabase_key):
-        self.supabase = create_client(supabase_url, supabase_key)
+    # Colunas lidas por cada consumidor (o id da paginação é incluído automaticamente)
+    COLUMN_REQUIREMENTS = {
+        'habit_matrix': {'habitos': ('id', 'nome'),
+                         'habitos_registros': ('habito_id', 'data_registro', 'nivel')},
+    }
+
+    def __init__(self, supabase_url, supabase_key, cache=None, client=None, history_years=0, aggregates=None):
+        self.supabase = client or get_client(supabase_url, supabase_key)
+        self.cache = cache
+        # Anos completos anteriores ao atual carregados junto (só para visões de vários anos)
+        self.history_years = history_years
+        # Backend de aggregates.py (ex.: SupabaseAggregates): taxas mensais e visão anual vêm das
+        # contagens do servidor; registros diários só do mês exibido e da janela das sequências
+        self.aggregates = aggregates
+        self.columns = ColumnRegistry(self.COLUMN_REQUIREMENTS)
         self.colors = {
             'default': '#f0f6fc',
             'background': '#0d1117',
@@ -630,88 +779,124 @@ class HabitTracker:
         }
         self.font_size = 8
 
-    def fetch_all_data(self):
-        """Busca todos os hábitos e todos os registros."""
+    def _fetch_habits(self):
+        return execute(self.supabase.table("habitos").select(self.columns.select("habitos")).eq("ativo", True), "habitos").data
+
+    # Dias da visão anual (estilo GitHub), que cruza a virada do ano
+    YEAR_VIEW_DAYS = 365
+    # Com `aggregates`: dias de registros diários usados nas sequências (recorde e pausas dentro da janela)
+    STREAK_WINDOW_DAYS = 90
+
+    def streak_days(self):
+        """Dias da janela das sequências do ranking: os da visão anual, ou STREAK_WINDOW_DAYS com `aggregates`."""
+        return self.STREAK_WINDOW_DAYS if self.aggregates is not None else self.YEAR_VIEW_DAYS
+
+    def registros_start(self, today=None):
+        """Primeiro dia de registros diários usado pelo relatório: 1º de janeiro do ano atual (menos
+        `history_years` anos) ou o início da visão anual, o que vier antes. Com `aggregates`, o início
+        do mês exibido ou da janela das sequências."""
+        today = today or datetime.now().date()
+        if self.aggregates is not None:
+            return min(today.replace(day=1), today - timedelta(days=self.streak_days() - 1))
+        year_start = today.replace(year=today.year - self.history_years, month=1, day=1)
+        return min(year_start, today - timedelta(days=self.YEAR_VIEW_DAYS - 1))
+
+    def _fetch_registros(self):
+        """Registros do ano atual desde `registros_start` (cache incremental, ou rede com filtro de data)
+        e anos anteriores do histórico."""
+        columns = self.columns.select("habitos_registros")
+        year_start = datetime.now().date().replace(month=1, day=1)
+        start = self.registros_start()
+        open_start = max(start, year_start).isoformat()
+        if self.cache is not None:
+            # Ano aberto: só as linhas novas e a janela recente vêm da rede
+            registros = self.cache.sync_records(self.supabase, "habitos_registros", columns=columns,
+                                                window_column="data_registro", window_start=self.cache.window_start(),
+                                                since=open_start, floor=year_start.isoformat())
+        else:
+            registros = fetch_records(self.supabase, "habitos_registros", columns=columns,
+                                      filters=[("gte", "data_registro", open_start)])
+
+        if start >= year_start:
+            return registros
+        if self.cache is not None:
+            # Anos encerrados não mudam: baixados uma vez e depois lidos do cache local. O cache guarda anos
+            # inteiros; só a parte desde `start` entra, como no caminho sem cache
+            older = self.cache.load_closed_years(self.supabase, "habitos_registros", "data_registro",
+                                                 range(start.year, year_start.year), columns=columns)
+            older = [record for record in older if record["data_registro"][:10] >= start.isoformat()]
+        else:
+            older = fetch_records(self.supabase, "habitos_registros", columns=columns,
+                                  filters=[("gte", "data_registro", start.isoformat()),
+                                           ("lt", "data_registro", year_start.isoformat())])
+        return older + registros
+
+    def fetch_jobs(self):
+        """Buscas independentes de hábitos para o FetchScheduler."""
+        jobs = {"habits:habitos": self._fetch_habits, "habits:habitos_registros": self._fetch_registros}
+        if self.aggregates is not None:
+            today = datetime.now().date()
+            jobs["habits:agg:habit_monthly"] = partial(self.aggregates.habit_monthly,
+                                                       since=today.replace(month=1, day=1).isoformat())
+            jobs["habits:agg:habit_daily"] = partial(self.aggregates.habit_daily,
+                                                     since=(today - timedelta(days=self.YEAR_VIEW_DAYS - 1)).isoformat())
+        return jobs
+
+    def fetch_all_data(self, scheduler=None):
+        """Busca os hábitos ativos e os registros do período do relatório."""
+        print("Buscando dados de Hábitos do Supabase...")
+        own_scheduler = scheduler is None
+        scheduler = scheduler or FetchScheduler()
+        try:
+            return self.process_results(scheduler.run(self.fetch_jobs()))
+        finally:
+            if own_scheduler:
+                scheduler.shutdown()
+
+    def process_results(self, results):
+        """(hábitos, registros, contagens do servidor {'monthly', 'daily'} ou None)."""
         try:
-            print("Buscando dados de Hábitos do Supabase...")
-            habits_response = self.supabase.table("habitos").select("*").eq("ativo", True).execute()
-            habits = habits_response.data
-            registros_response = self.supabase.table("habitos_registros").select("*").execute()
-            registros = registros_response.data
-            return habits, registros
+            counts = None
+            if self.aggregates is not None:
+                counts = {name: unwrap(results, f"habits:agg:habit_{name}") for name in ('monthly', 'daily')}
+            return unwrap(results, "habits:habitos"), unwrap(results, "habits:habitos_registros"), counts
         except Exception as e:
             print(f"Erro ao buscar todos os dados de hábito: {e}")
-            return [], []
-
-    def prepare_month_data(self, habits, registros, year, month):
-        _, num_days = calendar.monthrange(year, month)
-        habit_data = {}
-        for habit in habits:
-            habit_id = habit['id']
-            calendar_dict = {datetime(year, month, day).date(): 0 for day in range(1, num_days + 1)}
-            habit_registros = [r for r in registros if r['habito_id'] == habit_id]
-            for registro in habit_registros:
-                if isinstance(registro['data_registro'], str):
-                    registro_date = datetime.strptime(registro['data_registro'], '%Y-%m-%d').date()
-                else:
-                    registro_date = registro['data_registro']
-                if registro_date.year == year and registro_date.month == month:
-                    calendar_dict[registro_date] = registro['nivel']
-            habit_data[habit_id] = {'name': habit['nome'], 'calendar': calendar_dict}
-        return habit_data, num_days
-
-    def calculate_habit_rates(self, habits, all_registros, start_date, end_date):
-        habit_rates = {}; delta = end_date - start_date
-        total_days_in_period = delta.days + 1
-        for habit in habits:
-            habit_id = habit['id']
-            filtered_registros = [
-                r for r in all_registros 
-                if r['habito_id'] == habit_id and 
-                   start_date <= datetime.strptime(r['data_registro'], '%Y-%m-%d').date() <= end_date
-            ]
-            recorded_dates = {datetime.strptime(r['data_registro'], '%Y-%m-%d').date() for r in filtered_registros}
-            total_completed_days = len(recorded_dates)
-            rate = (total_completed_days / total_days_in_period * 100) if total_days_in_period > 0 else 0
-            habit_rates[habit_id] = {'name': habit['nome'], 'rate': rate}
-        return habit_rates
-    
-    def calculate_monthly_rates(self, habits, all_registros):
-        today = datetime.now(); current_year = today.year
-        monthly_rates_df = pd.DataFrame(index=[h['nome'] for h in habits])
-        for month_num in range(1, 13):
-            month_name = calendar.month_abbr[month_num]
-            _, num_days = calendar.monthrange(current_year, month_num)
-            start_date = datetime(current_year, month_num, 1).date()
-            end_date = datetime(current_year, month_num, num_days).date()
-            month_habit_rates = self.calculate_habit_rates(habits, all_registros, start_date, end_date)
-            month_column = {habit['nome']: month_habit_rates.get(habit['id'], {'rate': 0})['rate'] for habit in habits}
-            monthly_rates_df[month_name] = pd.Series(month_column)
-        return monthly_rates_df
-
-    def calculate_overall_monthly_rates(self, all_habits, all_registros):
-        today = datetime.now(); current_year = today.year; overall_monthly_rates = {}
-        for month_num in range(1, 13):
-            month_name = calendar.month_abbr[month_num]
-            _, num_days = calendar.monthrange(current_year, month_num)
-            start_date = datetime(current_year, month_num, 1).date()
-            end_date = datetime(current_year, month_num, num_days).date()
-            registros_month = [r for r in all_registros if start_date <= datetime.strptime(r['data_registro'], '%Y-%m-%d').date() <= end_date]
-            if not registros_month:
-                overall_monthly_rates[month_name] = np.nan; continue
-            total_possible_month = len(all_habits) * num_days
-            habit_dates_completed = {habit['id']: set() for habit in all_habits}
-            for reg in registros_month:
-                habit_dates_completed[reg['habito_id']].add(datetime.strptime(reg['data_registro'], '%Y-%m-%d').date())
-            total_completed_month = sum(len(dates) for dates in habit_dates_completed.values())
-            rate = (total_completed_month / total_possible_month * 100) if total_possible_month > 0 else 0
-            overall_monthly_rates[month_name] = rate
-        return overall_monthly_rates
-
-    def generate_overall_stats(self, habit_data, num_days, n_habits_total):
+            return [], [], None
+
+    def habit_matrix(self, habits, registros, year):
+        """HabitMatrix do ano (datas convertidas uma vez), reaproveitada enquanto as listas forem as mesmas."""
+        cached = getattr(self, '_matrix_cache', None)
+        if cached is None or cached[0] is not habits or cached[1] is not registros or cached[2].year != year:
+            first_year = min(year, self.registros_start().year)
+            cached = (habits, registros, HabitMatrix.from_records(habits, registros, year, first_year=first_year))
+            self._matrix_cache = cached
+        return cached[2]
+
+    def aggregate_stats(self, habits, counts, year):
+        """HabitAggregateStats do ano a partir das contagens agrupadas no servidor."""
+        return HabitAggregateStats.from_aggregates(habits, counts['monthly'], year, daily=counts['daily'])
+
+    def calculate_habit_rates(self, matrix, month):
+        """Taxa de conclusão do mês por hábito: {habito_id: {'name', 'rate'}}."""
+        rates = matrix.rates(month)
+        return {habit_id: {'name': name, 'rate': rate} for habit_id, name, rate in zip(matrix.habit_ids, matrix.names, rates)}
+
+    def calculate_streaks(self, matrix, today, days):
+        """Sequência atual, recorde e pausas de cada hábito (run-length sobre a matriz) nos `days` dias até `today`."""
+        return matrix.streaks(today, start=pd.Timestamp(today).normalize() - pd.Timedelta(days=days - 1))
+
+    def calculate_monthly_rates(self, matrix):
+        return matrix.monthly_rates()
+
+    def calculate_overall_monthly_rates(self, matrix):
+        return matrix.overall_monthly_rates()
+
+    def generate_overall_stats(self, matrix, month):
         """Gera estatísticas gerais"""
+        n_habits_total, num_days = len(matrix), matrix.days_in_month(month)
         total_possible = n_habits_total * num_days
-        total_completed = sum(1 for habit in habit_data.values() for level in habit['calendar'].values() if level > 0)
+        total_completed = matrix.month_completed(month)
         completion_rate = (total_completed / total_possible * 100) if total_possible > 0 else 0
         
         return (f"Total de Hábitos: {n_habits_total} | Dias no Mês: {num_days} | "
@@ -733,12 +918,14 @@ class HabitTracker:
         for spine in ax.spines.values(): spine.set_visible(False)
         return ax
 
-    def create_compact_calendar(self, habit_data, year, month, num_days, fig, gs_calendar):
+    def create_compact_calendar(self, matrix, year, month, fig, gs_calendar):
         """Cria o calendário compacto."""
         ax = fig.add_subplot(gs_calendar, facecolor=self.colors['background'])
         
         colors = {0: self.colors['level0'], 1: self.colors['level1'], 2: self.colors['level2'], 3: self.colors['level3'], 4: self.colors['level4']}
-        n_habits = len(habit_data)
+        n_habits = len(matrix)
+        num_days = matrix.days_in_month(month)
+        month_levels = matrix.month_levels(month)
         square_size = 0.7
         name_width = 3.0 
         
@@ -750,21 +937,16 @@ class HabitTracker:
             ax.text(x_pos + square_size/2, start_y_offset, str(day_num), 
                    ha='center', va='center', fontsize=7, fontweight='bold', color=self.colors['default'])
         
-        for habit_idx, (habit_id, habit) in enumerate(habit_data.items()):
+        for habit_idx, name in enumerate(matrix.names):
             y_pos = start_y_offset - (habit_idx * square_size) - square_size
             
-            ax.text(name_width - 0.2, y_pos + square_size/2, habit['name'], 
+            ax.text(name_width - 0.2, y_pos + square_size/2, name, 
                    ha='right', va='center', fontsize=self.font_size, fontweight='bold', color=self.colors['default'])
-            
-            for day_idx in range(num_days):
-                date = datetime(year, month, day_idx + 1).date()
-                level = habit['calendar'].get(date, 0)
-                color = colors.get(level, colors[0])
-                x_pos = start_x + (day_idx * square_size)
-                
-                rect = patches.Rectangle((x_pos, y_pos), square_size - 0.05, square_size - 0.05, 
-                                         linewidth=0.8, edgecolor=self.colors['border'], facecolor=color, joinstyle='round')
-                ax.add_patch(rect)
+        
+        # Grade (hábito × dia) inteira em um único artista
+        day_idx, habit_idx = np.meshgrid(np.arange(num_days), np.arange(n_habits))
+        self._draw_cells(ax, start_x + day_idx * square_size, start_y_offset - habit_idx * square_size - square_size,
+                         month_levels, square_size)
         
         total_width = start_x + (num_days * square_size)
         ax.set_xlim(0, total_width)
@@ -786,18 +968,64 @@ class HabitTracker:
         
         return ax
 
-    def create_ranking_section(self, fig, gs_ranking, habits, all_registros, year, month):
-        """Cria a seção de ranking."""
+    def _draw_cells(self, ax, x, y, levels, size):
+        """Desenha as células (x, y, nível) do calendário como uma única PatchCollection."""
+        palette = np.array([self.colors[f'level{i}'] for i in range(5)])
+        # Níveis fora de 0..4 ficam com a cor de "não feito"
+        levels = np.where((levels >= 0) & (levels <= 4), levels, 0).ravel()
+        cells = [patches.Rectangle((xi, yi), size - 0.05, size - 0.05) for xi, yi in zip(np.ravel(x), np.ravel(y))]
+        ax.add_collection(PatchCollection(cells, facecolors=palette[levels], edgecolors=self.colors['border'],
+                                          linewidths=0.8, joinstyle='round'))
+
+    def create_year_calendar(self, stats, today, fig, gs_year):
+        """Visão dos últimos 365 dias (estilo GitHub): uma coluna por semana, cor pela fração de hábitos feitos."""
+        ax = fig.add_subplot(gs_year, facecolor=self.colors['background'])
+        completion = stats.daily_completion(today, self.YEAR_VIEW_DAYS)
+        dates = completion.index
+        # Nível 0..4 pela fração do dia: qualquer hábito feito já vale nível 1
+        levels = np.ceil(completion.to_numpy() * 4).astype(int)
+
+        square_size = 0.7
+        label_width = 1.6
+        first_monday = dates[0] - pd.Timedelta(days=dates[0].weekday())
+        week = ((dates - first_monday).days // 7).to_numpy()
+        weekday = dates.weekday.to_numpy()
+        self._draw_cells(ax, label_width + week * square_size, (6 - weekday) * square_size, levels, square_size)
+
+        for row, label in ((0, 'Seg'), (2, 'Qua'), (4, 'Sex')):
+            ax.text(label_width - 0.2, (6 - row) * square_size + square_size / 2, label,
+                    ha='right', va='center', fontsize=6, color=self.colors['default'])
+        for first_day in dates[dates.day == 1]:
+            x_pos = label_width + ((first_day - first_monday).days // 7) * square_size
+            ax.text(x_pos, 7 * square_size + 0.2, first_day.strftime('%b'), ha='left', va='bottom',
+                    fontsize=6, color=self.colors['default'])
+
+        n_weeks = int(week[-1]) + 1
+        ax.set_xlim(0, label_width + n_weeks * square_size)
+        ax.set_ylim(0, 8 * square_size + 0.2)
+        ax.set_aspect('equal')
+        ax.set_xticks([]); ax.set_yticks([])
+        for spine in ax.spines.values(): spine.set_visible(False)
+        ax.set_title(f"Últimos {self.YEAR_VIEW_DAYS} dias - todos os hábitos (média {completion.mean() * 100:.1f}%)",
+                     fontsize=10, fontweight='bold', pad=6, color=self.colors['default'])
+        return ax
+
+    def create_ranking_section(self, fig, gs_ranking, matrix, month, today=None, stats=None, streak_days=None):
+        """Cria a seção de ranking, com a sequência atual, o recorde e a maior pausa de cada hábito.
+
+        Taxas de `stats` (HabitMatrix ou HabitAggregateStats; padrão: `matrix`); sequências da matriz
+        diária nos últimos `streak_days` dias (padrão: `streak_days()`), indicados no título.
+        """
+        streak_days = streak_days or self.streak_days()
         ax = fig.add_subplot(gs_ranking, facecolor=self.colors['secondary_bg'])
-        ax.set_title("Ranking de Hábitos (Mês Atual)", fontsize=12, fontweight='bold', color=self.colors['default'], pad=10)
-        
-        _, num_days = calendar.monthrange(year, month)
-        start_date = datetime(year, month, 1).date()
-        end_date = datetime(year, month, num_days).date()
+        ax.set_title(f"Ranking de Hábitos (Mês Atual) - sequências nos últimos {streak_days} dias", fontsize=12,
+                     fontweight='bold', color=self.colors['default'], pad=10)
         
-        habit_rates = self.calculate_habit_rates(habits, all_registros, start_date, end_date)
+        habit_rates = self.calculate_habit_rates(stats if stats is not None else matrix, month)
+        streaks = self.calculate_streaks(matrix, today or datetime.now(), streak_days)
         
-        sorted_habits = sorted(habit_rates.values(), key=lambda x: x['rate'], reverse=True)
+        sorted_ids = sorted(habit_rates, key=lambda habit_id: habit_rates[habit_id]['rate'], reverse=True)
+        sorted_habits = [habit_rates[habit_id] for habit_id in sorted_ids]
         
         y_pos = np.arange(len(sorted_habits))
         rates = [h['rate'] for h in sorted_habits]
@@ -808,13 +1036,20 @@ class HabitTracker:
         bars = ax.barh(y_pos, rates, color=bar_colors[::-1])
         ax.set_yticks(y_pos, labels=names, color=self.colors['default'], fontsize=self.font_size)
         ax.set_xlabel("Taxa de Conclusão (%)", color=self.colors['default'], fontsize=self.font_size)
-        ax.set_xlim(0, 100)
+        # Eixo até 100%; o espaço à direita fica para a coluna de sequências
+        ax.set_xlim(0, 150)
+        ax.set_xticks(range(0, 101, 20))
         ax.tick_params(axis='x', colors=self.colors['default'])
         
-        for bar in bars:
+        for bar, habit_id in zip(bars, sorted_ids):
             width = bar.get_width()
-            ax.text(width + 2, bar.get_y() + bar.get_height()/2, f'{width:.1f}%',
+            y_center = bar.get_y() + bar.get_height()/2
+            ax.text(width + 2, y_center, f'{width:.1f}%',
                     va='center', ha='left', color=self.colors['default'], fontsize=self.font_size - 1)
+            atual, recorde, maior_pausa = (int(streaks.at[habit_id, c]) for c in ('atual', 'recorde', 'maior_pausa'))
+            ax.text(149, y_center, f"Seq. {atual}d | Recorde {recorde}d | Maior pausa {maior_pausa}d",
+                    va='center', ha='right', color=self.colors['level4'] if atual > 0 else self.colors['default'],
+                    fontsize=self.font_size - 1)
 
         ax.invert_yaxis()
         for spine in ax.spines.values(): spine.set_visible(False)
@@ -826,27 +1061,31 @@ class HabitTracker:
         ax.set_title("Taxa de Conclusão Mensal por Hábito (%)", 
                      fontsize=12, fontweight='bold', color=self.colors['default'], pad=10)
         
-        df_display = monthly_rates_df.applymap(lambda x: f"{x:.1f}%")
-        habit_overall_rates = monthly_rates_df.mean(axis=1).apply(lambda x: f"{x:.1f}%")
-        df_display['Geral'] = habit_overall_rates
-        
-        table = ax.table(cellText=df_display.values, colLabels=df_display.columns, 
-                         rowLabels=df_display.index, loc='center', cellLoc='center')
-        
-        table.auto_set_font_size(False); table.set_fontsize(self.font_size); table.scale(1.0, 1.2)
-        
-        for (i, j), cell in table.get_celld().items():
-            cell.set_edgecolor(self.colors['border']); cell.set_facecolor(self.colors['secondary_bg'])
-            cell.set_text_props(color=self.colors['default'])
-            
-            if i == 0 or j == -1:
-                cell.set_facecolor(self.colors['background']); cell.set_text_props(weight='bold', color=self.colors['default'])
-            
-            current_month_name = calendar.month_abbr[current_month_num]
-            if j >= 0 and df_display.columns[j] == current_month_name:
-                cell.set_facecolor(self.colors['highlight']); cell.set_text_props(weight='bold', color='white')
-        
-        ax.axis('off')
+        # Grade completa (cabeçalho + rótulos) montada por fatias; formatação vetorizada por coluna
+        rates = np.column_stack([monthly_rates_df.to_numpy(dtype=float), monthly_rates_df.mean(axis=1).to_numpy()])
+        columns = list(monthly_rates_df.columns) + ['Geral']
+        n_rows, n_cols = rates.shape
+        text = np.empty((n_rows + 1, n_cols + 1), dtype=object)
+        text[0, 1:] = columns
+        text[1:, 0] = monthly_rates_df.index
+        text[1:, 1:] = format_percent(rates)
+
+        face = np.full(text.shape, self.colors['secondary_bg'], dtype=object)
+        face[0, :] = face[:, 0] = self.colors['background']
+        face[0, 0] = None  # canto sem célula, como no ax.table
+        text_colors = np.full(text.shape, self.colors['default'], dtype=object)
+        weights = np.full(text.shape, 'normal', dtype=object)
+        weights[0, :] = weights[:, 0] = 'bold'
+        current_month_name = calendar.month_abbr[current_month_num]
+        if current_month_name in columns:
+            j = columns.index(current_month_name) + 1
+            face[:, j], text_colors[:, j], weights[:, j] = self.colors['highlight'], 'white', 'bold'
+
+        label_width = 0.14
+        align = np.full(text.shape, 'center', dtype=object)
+        align[1:, 0] = 'left'
+        draw_table(ax, text, face, text_colors, weights, align=align, font_size=self.font_size, row_scale=1.2,
+                   col_widths=[label_width] + [(1 - label_width) / n_cols] * n_cols, edge_color=self.colors['border'])
 
     def create_overall_monthly_chart(self, fig, gs_chart, overall_monthly_rates):
         """Cria o gráfico de linha com quebras para dados ausentes."""
@@ -865,11 +1104,15 @@ class HabitTracker:
         ax.grid(True, linestyle='--', alpha=0.3, color=self.colors['default'])
         for spine in ax.spines.values(): spine.set_visible(False)
         
-    def generate_figure(self):
-        """Gera e retorna a figura completa do relatório de hábitos (Página 1)."""
+    def generate_figure(self, habits_data=None):
+        """Gera e retorna a figura completa do relatório de hábitos (Página 1).
+
+        `habits_data` é o retorno de process_results (hábitos, registros, contagens do servidor);
+        se omitido, busca agora.
+        """
         plt.style.use('dark_background')
         
-        all_habits, all_registros = self.fetch_all_data()
+        all_habits, all_registros, counts = habits_data if habits_data is not None else self.fetch_all_data()
         if not all_habits:
             print("Nenhum hábito ativo encontrado!"); return None
         
@@ -878,10 +1121,13 @@ class HabitTracker:
         current_year, current_month = today.year, today.month
         month_name = calendar.month_name[current_month]
 
-        current_month_habit_data, current_num_days = self.prepare_month_data(all_habits, all_registros, current_year, current_month)
-        monthly_rates_df = self.calculate_monthly_rates(all_habits, all_registros)
-        overall_monthly_rates = self.calculate_overall_monthly_rates(all_habits, all_registros)
-        stats_text = self.generate_overall_stats(current_month_habit_data, current_num_days, len(all_habits))
+        # Matriz (hábito × dia do ano) montada uma vez; calendário e sequências leem dela. Taxas mensais,
+        # tabela, resumo e visão anual vêm das contagens do servidor quando houver, senão da matriz
+        matrix = self.habit_matrix(all_habits, all_registros, current_year)
+        stats = self.aggregate_stats(all_habits, counts, current_year) if counts is not None else matrix
+        monthly_rates_df = self.calculate_monthly_rates(stats)
+        overall_monthly_rates = self.calculate_overall_monthly_rates(stats)
+        stats_text = self.generate_overall_stats(stats, current_month)
 
         # Configuração do Layout - A4 (8.5x11 inches)
         FIG_WIDTH, FIG_HEIGHT = 8.5, 11.0 
@@ -890,9 +1136,9 @@ class HabitTracker:
         n_habits = len(all_habits)
         CALENDAR_HEIGHT_RATIO = max(1.0, n_habits * 0.15 + 0.5) 
         
-        # Grid: [0.3: Resumo, CALENDAR_HEIGHT_RATIO: Calendário, 0.7: Ranking, 1.2: Tabela, 0.8: Gráfico]
-        gs = fig.add_gridspec(nrows=5, ncols=1, 
-                              height_ratios=[0.3, CALENDAR_HEIGHT_RATIO, 0.7, 1.2, 0.8], 
+        # Grid: [0.3: Resumo, CALENDAR_HEIGHT_RATIO: Calendário, 0.5: Ano, 0.7: Ranking, 1.2: Tabela, 0.8: Gráfico]
+        gs = fig.add_gridspec(nrows=6, ncols=1, 
+                              height_ratios=[0.3, CALENDAR_HEIGHT_RATIO, 0.5, 0.7, 1.2, 0.8], 
                               hspace=0.6)
         
         # 1. Resumo Geral
@@ -900,18 +1146,21 @@ class HabitTracker:
         self.create_summary_header(fig, gs_summary[0], stats_text, month_name)
         
         # 2. Calendário
-        self.create_compact_calendar(current_month_habit_data, current_year, current_month, current_num_days, fig, gs[1])
+        self.create_compact_calendar(matrix, current_year, current_month, fig, gs[1])
+        
+        # 2b. Últimos 365 dias
+        self.create_year_calendar(stats, today, fig, gs[2])
         
         # 3. Ranking
-        gs_ranking = gs[2].subgridspec(1, 1, hspace=0)
-        self.create_ranking_section(fig, gs_ranking[0], all_habits, all_registros, current_year, current_month)
+        gs_ranking = gs[3].subgridspec(1, 1, hspace=0)
+        self.create_ranking_section(fig, gs_ranking[0], matrix, current_month, today, stats=stats)
         
         # 4. Tabela
-        gs_table = gs[3].subgridspec(1, 1, hspace=0)
+        gs_table = gs[4].subgridspec(1, 1, hspace=0)
         self.create_monthly_table(fig, gs_table[0], monthly_rates_df, current_month)
         
         # 5. Gráfico
-        gs_chart = gs[4].subgridspec(1, 1, hspace=0)
+        gs_chart = gs[5].subgridspec(1, 1, hspace=0)
         self.create_overall_monthly_chart(fig, gs_chart[0], overall_monthly_rates)
         
         plt.figtext(0.98, 0.01, f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M')}", ha='right', fontsize=8, color=self.colors['default'])
@@ -929,7 +1178,6 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.gridspec as gridspec
 from datetime import datetime, timedelta
-from supabase import create_client, Client 
 from PIL import Image 
 from imageio.v3 import imread 
 
@@ -942,7 +1190,6 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.gridspec as gridspec
 from datetime import datetime, timedelta
-from supabase import create_client, Client 
 from PIL import Image 
 from imageio.v3 import imread 
 
@@ -955,7 +1202,6 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.gridspec as gridspec
 from datetime import datetime, timedelta
-from supabase import create_client, Client 
 from PIL import Image 
 from imageio.v3 import imread 
 
@@ -1021,6 +1267,15 @@ class WorkoutReport:
     
     # NOVAS CONSTANTES HRR
     HRR_EXERCICIO_ID = 16 # ID do exercício "HRR" no banco
+
+    # Colunas lidas por cada consumidor
+    COLUMN_REQUIREMENTS = {
+        'process_results': {'exercicios': ('id', 'nome', 'grupo_muscular_primario', 'grupos_musculares_secundarios'),
+                            'registros_treino': ('id', 'data_treino'),
+                            'registro_exercicios': ('registro_treino_id', 'exercicio_id', 'peso', 'repeticoes', 'tempo')},
+        '_fetch_user_body_weight': {'peso_corporal': ('peso_kg',)},
+        '_fetch_force_ranks_map': {'configuracao_rank_forca': ('nome_exercicio', 'rank_nome', 'multiplo_pc')},
+    }
     
     # NOVO Mapeamento de Cores para HRR (Gradiente de Azul: Escuro -> Claro/Brilhante)
     HRR_THRESHOLDS = {
@@ -1032,9 +1287,11 @@ class WorkoutReport:
 
 
     
-    def __init__(self, supabase_url, supabase_key):
+    def __init__(self, supabase_url, supabase_key, cache=None, client=None):
         self.supabase_url = supabase_url
         self.supabase_key = supabase_key
+        self.cache = cache
+        self.columns = ColumnRegistry(self.COLUMN_REQUIREMENTS)
         
         self.colors = {
             'default': '#f0f6fc',
@@ -1049,13 +1306,14 @@ class WorkoutReport:
         self.BODY_MAP_PATH = "body.png"
         
         try:
-            self.supabase: Client = create_client(supabase_url, supabase_key)
+            self.supabase: Client = client or get_client(supabase_url, supabase_key)
         except Exception as e:
             print(f"❌ ERRO ao inicializar cliente Supabase: {e}")
             self.supabase = None 
         
-        self.user_body_weight = self._fetch_user_body_weight()
-        self.force_ranks_map = self._fetch_force_ranks_map()
+        # Preenchidos por process_results (busca feita junto com os treinos, em paralelo)
+        self.user_body_weight = 75.0
+        self.force_ranks_map = {}
         
         try:
             self.body_map_img = imread(self.BODY_MAP_PATH)
@@ -1099,14 +1357,8 @@ class WorkoutReport:
                         
         return mask_map
 
-    def fetch_data_for_four_weeks(self):
-        """
-        Busca dados para 4 janelas de 7 dias, incluindo 'peso', 'repeticoes', 'tempo' e 'nome'
-        para os cálculos de Volume e Força.
-        """
-        if self.supabase is None:
-            return []
-
+    def _week_windows(self):
+        """Calcula as 4 janelas de 7 dias (mais antiga primeiro) no fuso local."""
         try:
             local_tz = pytz.timezone(self.LOCAL_TIMEZONE)
         except pytz.UnknownTimeZoneError:
@@ -1122,34 +1374,133 @@ class WorkoutReport:
             windows.append({'start': start_date, 'end': end_date})
             
         windows.reverse() 
+        return local_tz, windows
 
-        data_minima_iso = windows[0]['start'].astimezone(pytz.utc).isoformat()
+    def _embedded_sessions_select(self):
+        """
+        Projeção de 'registros_treino' com as séries e o exercício de cada série embutidos.
+
+        Montada a partir das colunas declaradas para as tabelas planas; depende das FKs
+        registro_exercicios -> registros_treino e registro_exercicios -> exercicios.
+        """
+        set_columns = [c for c in split_columns(self.columns.select('registro_exercicios')) if c != 'registro_treino_id']
+        exercise_columns = [c for c in split_columns(self.columns.select('exercicios')) if c != 'id']
+        return (f"{self.columns.select('registros_treino')}, "
+                f"registro_exercicios({', '.join(set_columns)}, exercicios({', '.join(exercise_columns)}))")
+
+    @staticmethod
+    def _flatten_sessions(sessions):
+        """Transforma treinos com séries embutidas em uma linha por série (com data e dados do exercício)."""
+        rows = []
+        for session in sessions:
+            for serie in session.get('registro_exercicios') or []:
+                serie = dict(serie)
+                exercicio = serie.pop('exercicios', None)
+                if not exercicio:
+                    continue # mesmo efeito do merge (inner) com a tabela de exercícios
+                rows.append({'registro_treino_id': session['id'], 'data_treino': session['data_treino'], **serie, **exercicio})
+        return pd.DataFrame(rows)
+
+    def _fetch_sets_chunked(self, data_minima_iso):
+        """Caminho alternativo sem recursos embutidos: ids dos treinos consultados em blocos paralelos."""
+        sessions = fetch_records(self.supabase, 'registros_treino', columns=self.columns.select('registros_treino'),
+                                 filters=[('gte', 'data_treino', data_minima_iso)])
+        if not sessions:
+            return pd.DataFrame()
+        df_rt = pd.DataFrame(sessions).rename(columns={'id': 'registro_treino_id'})
+
+        df_registros = pd.DataFrame(fetch_in_chunks(self.supabase, 'registro_exercicios', 'registro_treino_id',
+                                                    df_rt['registro_treino_id'].tolist(),
+                                                    columns=self.columns.select('registro_exercicios')))
+        if df_registros.empty:
+            return pd.DataFrame()
+        df_registros = df_registros.drop(columns='id', errors='ignore')
+
+        # Só os exercícios usados no período (sem o limite de 500 linhas da busca antiga)
+        df_exercicios = pd.DataFrame(fetch_in_chunks(self.supabase, 'exercicios', 'id',
+                                                     df_registros['exercicio_id'].unique().tolist(),
+                                                     columns=self.columns.select('exercicios')))
+        if df_exercicios.empty:
+            return pd.DataFrame()
+        df_exercicios = df_exercicios.rename(columns={'id': 'exercicio_id'})
+
+        return df_registros.merge(df_rt, on='registro_treino_id').merge(df_exercicios, on='exercicio_id')
+
+    def _fetch_treinos(self, data_minima_iso):
+        """
+        Busca as séries do período já com a data do treino e os dados do exercício.
+
+        Uma única consulta a 'registros_treino' com os recursos embutidos substitui as três
+        buscas + merges; se a API recusar o embed, cai para a busca em blocos.
+        """
+        embedded_select = self._embedded_sessions_select()
+        try:
+            if self.cache is not None:
+                # Treinos (com séries) do período em cache; a janela recente é re-baixada a cada execução
+                sessions = self.cache.sync_records(self.supabase, 'registros_treino', columns=embedded_select,
+                                                   window_column='data_treino', window_start=self.cache.window_start(),
+                                                   since=data_minima_iso, floor=data_minima_iso)
+            else:
+                sessions = fetch_records(self.supabase, 'registros_treino', columns=embedded_select,
+                                         filters=[('gte', 'data_treino', data_minima_iso)])
+        except APIError as e:
+            print(f"⚠️ Consulta com recursos embutidos indisponível ({e.message}). Buscando séries em blocos.")
+            return self._fetch_sets_chunked(data_minima_iso)
+        return self._flatten_sessions(sessions)
+
+    def fetch_jobs(self):
+        """Buscas independentes de treino para o FetchScheduler (peso, ranks e treinos com séries)."""
+        self.local_tz, self.week_windows = self._week_windows()
+        data_minima_iso = self.week_windows[0]['start'].astimezone(pytz.utc).isoformat()
+        if self.supabase is None:
+            return {}
+        return {
+            'workout:peso_corporal': self._fetch_user_body_weight,
+            'workout:configuracao_rank_forca': self._fetch_force_ranks_map,
+            'workout:treinos': partial(self._fetch_treinos, data_minima_iso),
+        }
+
+    def fetch_data_for_four_weeks(self, scheduler=None):
+        """
+        Busca dados para 4 janelas de 7 dias, incluindo 'peso', 'repeticoes', 'tempo' e 'nome'
+        para os cálculos de Volume e Força. As consultas independentes rodam em paralelo.
+        """
+        own_scheduler = scheduler is None
+        scheduler = scheduler or FetchScheduler()
+        try:
+            return self.process_results(scheduler.run(self.fetch_jobs()))
+        finally:
+            if own_scheduler:
+                scheduler.shutdown()
+
+    def process_results(self, results):
+        """Aplica peso corporal e ranks e separa as séries nas 4 janelas semanais."""
+        if self.supabase is None:
+            return []
+
+        # Peso e ranks já têm fallback próprio; aqui só cobre falha/timeout do agendador
+        weight = results.get('workout:peso_corporal')
+        self.user_body_weight = 75.0 if isinstance(weight, Exception) else weight
+        ranks = results.get('workout:configuracao_rank_forca')
+        self.force_ranks_map = {} if isinstance(ranks, Exception) else ranks
+
+        local_tz, windows = self.local_tz, self.week_windows
         
         try:
-            response_ex = self.supabase.table('exercicios').select('id, nome, grupo_muscular_primario, grupos_musculares_secundarios').limit(500).execute()
-            df_exercicios = pd.DataFrame(response_ex.data).rename(columns={'id': 'exercicio_id'})
+            df_full = unwrap(results, 'workout:treinos')
             
-            response_rt = self.supabase.table('registros_treino').select('id, data_treino').gte('data_treino', data_minima_iso).execute()
-            df_rt = pd.DataFrame(response_rt.data).rename(columns={'id': 'registro_treino_id'})
-            
-            if df_rt.empty or df_exercicios.empty:
+            if df_full.empty:
                 return []
-
-            treino_ids = df_rt['registro_treino_id'].tolist()
-            response_reg = self.supabase.table('registro_exercicios').select('registro_treino_id, exercicio_id, peso, repeticoes, tempo').in_('registro_treino_id', treino_ids).execute()
-            df_registros = pd.DataFrame(response_reg.data)
             
-            df_full = df_registros.merge(df_rt, on='registro_treino_id')
             df_full['data_treino'] = pd.to_datetime(df_full['data_treino'])
-            df_full = df_full.merge(df_exercicios, on='exercicio_id')
-            
             df_full['data_treino'] = df_full['data_treino'].dt.tz_convert(local_tz)
+            # Ordenado por data uma vez; cada janela semanal é um recorte por busca binária
+            sessions = TimeTable(df_full, 'data_treino')
 
             weekly_data_sets = []
             for window in windows:
-                df_window = df_full[(df_full['data_treino'] >= window['start']) & (df_full['data_treino'] <= window['end'])].copy()
-                
-                df_sets_in_period = df_window.copy()
+                # Fatia sem cópia: os consumidores só leem (ou concatenam) as séries da semana
+                df_sets_in_period = sessions.between(window['start'], window['end'])
                 
                 weekly_data_sets.append({
                     'start_date': window['start'].strftime('%d/%m'),
@@ -1169,8 +1520,8 @@ class WorkoutReport:
         if df_sets.empty:
             return {}
 
-        df_sets['series_set'] = 1
-        series_por_exercicio = df_sets.groupby('exercicio_id')['series_set'].sum()
+        # Uma série por linha; sem criar coluna, já que df_sets é uma fatia do TimeTable
+        series_por_exercicio = df_sets.groupby('exercicio_id').size()
         muscle_series_total = {}
         
         df_exercicios_unique = df_sets.drop_duplicates(subset=['exercicio_id'])
@@ -1283,7 +1634,7 @@ class WorkoutReport:
         if self.supabase is None: return 75.0 
         
         try:
-            response = self.supabase.table('peso_corporal').select('peso_kg').order('data_registro', desc=True).limit(1).execute()
+            response = execute(self.supabase.table('peso_corporal').select(self.columns.select('peso_corporal')).order('data_registro', desc=True).limit(1), 'peso_corporal')
             
             if response.data and response.data[0]['peso_kg'] is not None:
                 return float(response.data[0]['peso_kg'])
@@ -1299,7 +1650,7 @@ class WorkoutReport:
         if self.supabase is None: return {}
         
         try:
-            response = self.supabase.table('configuracao_rank_forca').select('nome_exercicio, rank_nome, multiplo_pc').execute()
+            response = execute(self.supabase.table('configuracao_rank_forca').select(self.columns.select('configuracao_rank_forca')), 'configuracao_rank_forca')
             
             rank_map = {}
             for row in response.data:
@@ -1532,42 +1883,15 @@ class WorkoutReport:
         ax.text(0.5, 0.95, "Volume (Últimas 28 dias)", 
                 ha='center', va='top', fontsize=10, fontweight='bold', color=self.colors['default'])
         
-        table_data = []
-        for category in self.RADAR_CATEGORIES:
-            volume = radar_values_map.get(category, 0)
-            
-            if volume >= 1000000:
-                vol_str = f"{volume/1000000:.2f}M kg"
-            elif volume >= 1000:
-                vol_str = f"{volume/1000:.2f}k kg"
-            else:
-                vol_str = f"{volume:.0f} kg"
-                
-            table_data.append([category, vol_str])
-            
-        # Ambos os rótulos de coluna vazios para remover "Eixo"
-        table = ax.table(cellText=table_data, 
-                         colLabels=["", ""], 
-                         loc='center', 
-                         cellLoc='left',
-                         colColours=[self.colors['secondary_bg']]*2, 
-                         cellColours=[[self.colors['secondary_bg']]*2]*len(table_data)
-                         )
-                         
-        table.auto_set_font_size(False)
-        table.set_fontsize(8)
-        table.scale(1, 1.5) 
-
-        for i in range(len(table_data)):
-            table[(i+1, 0)].get_text().set_color(self.colors['default']) 
-            table[(i+1, 1)].get_text().set_color(self.colors['radar_fill']) 
-            table[(i+1, 1)].set_text_props(ha='right') 
-            
-        # Limpa o texto dos rótulos de cabeçalho
-        for j in range(2):
-            table[(0, j)].get_text().set_color(self.colors['default'])
-            table[(0, j)].get_text().set_text('') 
-        table[(0, 1)].set_text_props(ha='right')
+        volumes = [radar_values_map.get(category, 0) for category in self.RADAR_CATEGORIES]
+        # Cabeçalho vazio (sem rótulos de coluna), mantido para a mesma altura da tabela
+        text = np.empty((len(volumes) + 1, 2), dtype=object)
+        text[0, :] = ''
+        text[1:, 0] = self.RADAR_CATEGORIES
+        text[1:, 1] = format_scaled(volumes, 'kg', decimals=2, small_decimals=0)
+        text_colors = np.array([self.colors['default'], self.colors['radar_fill']], dtype=object)
+        draw_table(ax, text, np.full(text.shape, self.colors['secondary_bg'], dtype=object), text_colors,
+                   align=['left', 'right'], font_size=8, row_scale=1.5)
         
     def _plot_force_rank_table_internal(self, ax, force_rank_data):
         """
@@ -1579,58 +1903,31 @@ class WorkoutReport:
         ax.text(0.5, 0.95, "Força Máxima (Max Load/Reps)", 
                 ha='center', va='top', fontsize=10, fontweight='bold', color=self.colors['default'])
         
-        table_data = []
-        
         ordered_data = {item['nome']: item for item in force_rank_data}
         ordered_list = [ordered_data.get(name, {'nome': name, 'max_value': 0.0, 'rank': 'F'}) 
                         for name in ['Supino', 'Agachamento', 'Remada curv.', 'Push Press', 'Terra', 'Barra fixa']]
-        
-        for item in ordered_list:
-            max_value = item['max_value']
-            ex_name = item['nome']
-            
-            if ex_name == 'Barra fixa':
-                vol_str = f"{max_value:.0f} Reps" if max_value > 0 else "N/A"
-            else:
-                if max_value >= 1000:
-                    vol_str = f"{max_value/1000:.1f}k kg"
-                elif max_value > 0:
-                    vol_str = f"{max_value:.1f} kg"
-                else:
-                    vol_str = "N/A"
-            
-            table_data.append([ex_name, vol_str, item['rank']])
-            
-        table = ax.table(cellText=table_data, 
-                         colLabels=["Exercício", "Max", "Rank"], 
-                         loc='center', 
-                         cellLoc='left',
-                         colColours=[self.colors['secondary_bg']]*3, 
-                         cellColours=[[self.colors['secondary_bg']]*3]*len(table_data)
-                         )
-                         
-        table.auto_set_font_size(False)
-        table.set_fontsize(7.5) 
-        table.scale(1, 1.25) 
-
-        for i in range(len(table_data)):
-            table[(i+1, 0)].get_text().set_color(self.colors['default']) 
-            
-            # Cor da coluna Max alterada para azul (radar_fill)
-            table[(i+1, 1)].get_text().set_color(self.colors['radar_fill']) 
-            
-            table[(i+1, 1)].set_text_props(ha='right') 
-            
-            # APLICAÇÃO DO GRADIENTE DE COR DO RANK:
-            rank_text = table_data[i][2] 
-            color_for_rank = self.RANK_COLORS.get(rank_text, self.colors['default']) 
-            table[(i+1, 2)].get_text().set_color(color_for_rank) 
-            table[(i+1, 2)].set_text_props(ha='center')
-            
-        for j in range(3):
-            table[(0, j)].get_text().set_color(self.colors['default'])
-        table[(0, 1)].set_text_props(ha='right')
-        table[(0, 2)].set_text_props(ha='center')
+        names = np.array([item['nome'] for item in ordered_list], dtype=object)
+        max_values = np.array([item['max_value'] for item in ordered_list], dtype=float)
+        ranks = np.array([item['rank'] for item in ordered_list], dtype=object)
+
+        # Barra fixa em repetições; os demais em kg
+        is_reps = names == 'Barra fixa'
+        reps_text = np.where(max_values > 0, np.char.mod('%.0f Reps', max_values), 'N/A')
+        load_text = format_scaled(max_values, 'kg', decimals=1, small_decimals=1, empty='N/A')
+        
+        text = np.empty((len(ordered_list) + 1, 3), dtype=object)
+        text[0, :] = ["Exercício", "Max", "Rank"]
+        text[1:, 0] = names
+        text[1:, 1] = np.where(is_reps, reps_text, load_text)
+        text[1:, 2] = ranks
+
+        text_colors = np.full(text.shape, self.colors['default'], dtype=object)
+        # Cor da coluna Max em azul (radar_fill) e gradiente de cor do rank
+        text_colors[1:, 1] = self.colors['radar_fill']
+        text_colors[1:, 2] = [self.RANK_COLORS.get(rank, self.colors['default']) for rank in ranks]
+        align = np.array([['center', 'right', 'center']] + [['left', 'right', 'center']] * len(ordered_list), dtype=object)
+        draw_table(ax, text, np.full(text.shape, self.colors['secondary_bg'], dtype=object), text_colors,
+                   align=align, font_size=7.5, row_scale=1.25)
 
     def create_volume_radar_charts(self, fig, gs_volume_charts, weekly_volume_data, weekly_data_sets):
         """Gráfico 2: Plota o Radar, Tabela de Volume e Tabela de Força juntos."""
@@ -1791,14 +2088,18 @@ class WorkoutReport:
         ax.spines['bottom'].set_color(self.colors['border'])
         ax.spines['left'].set_color(self.colors['border'])
 
-    def generate_figure(self):
-        """Gera a figura completa do relatório de treino (Página 3)."""
+    def generate_figure(self, weekly_data_sets=None):
+        """Gera a figura completa do relatório de treino (Página 3).
+
+        `weekly_data_sets` é o resultado de `process_results`; se omitido, busca agora.
+        """
         plt.style.use('dark_background')
         
         FIG_WIDTH, FIG_HEIGHT = 8.5, 11.0 
         fig_page3 = plt.figure(figsize=(FIG_WIDTH, FIG_HEIGHT), facecolor=self.colors['background'], dpi=300) 
         
-        weekly_data_sets = self.fetch_data_for_four_weeks()
+        if weekly_data_sets is None:
+            weekly_data_sets = self.fetch_data_for_four_weeks()
         
         gs_page3 = gridspec.GridSpec(3, 1, figure=fig_page3, 
                                      hspace=0.45, wspace=0.2, 
@@ -1831,19 +2132,60 @@ class WorkoutReport:
 # --- CLASSE 3: MASTER REPORT GENERATOR (Orquestrador e Gerador de PDF) ---
 class MasterReportGenerator:
     """Orquestra a geração dos relatórios de Finanças, Hábitos e Treino e os salva em um único PDF."""
-    def __init__(self, supabase_url, supabase_key):
+    def __init__(self, supabase_url, supabase_key, cache_path=DEFAULT_CACHE_PATH, max_concurrency=8, query_timeout=60,
+                 server_aggregates=False, finance_rollup=False, invoice_horizon_months=FinanceReport.INVOICE_HORIZON_MONTHS):
         self.SUPABASE_URL = supabase_url
         self.SUPABASE_KEY = supabase_key
+        # Cache local incremental (SQLite); cache_path=None desativa e busca tudo da rede
+        self.cache = SyncCache(cache_path) if cache_path else None
+        # Limite de consultas simultâneas e tempo máximo (s) de cada consulta
+        self.max_concurrency = max_concurrency
+        self.query_timeout = query_timeout
+        # Um único cliente (uma sessão HTTP com pool) para os três relatórios
+        self.client = get_client(supabase_url, supabase_key, max_connections=max_concurrency, timeout=query_timeout)
+        # Totais mensais lidos do resumo persistido pelo atualizar_db_finance.py (sql/resumo_mensal.sql)
+        # ou agrupados no Postgres na hora (views de sql/finance_aggregates.sql)
+        if finance_rollup:
+            self.finance_aggregates = RollupAggregates(self.client)
+        elif server_aggregates:
+            self.finance_aggregates = SupabaseAggregates(self.client)
+        else:
+            self.finance_aggregates = None
+        # Taxas mensais de hábitos pela view de sql/habit_aggregates.sql
+        self.habit_aggregates = SupabaseAggregates(self.client) if server_aggregates else None
+        # Meses de faturas futuras no gráfico de dívida (ex.: 36 ou 60 para uma projeção longa)
+        self.invoice_horizon_months = invoice_horizon_months
 
     def generate_all_reports(self, output_filename="Relatorio_Geral_Consolidado.pdf"):
         plt.style.use('dark_background')
         
         # 1. Instanciar e buscar dados
-        finance_reporter = FinanceReport(self.SUPABASE_URL, self.SUPABASE_KEY)
-        habit_tracker = HabitTracker(self.SUPABASE_URL, self.SUPABASE_KEY)
-        workout_reporter = WorkoutReport(self.SUPABASE_URL, self.SUPABASE_KEY) # NOVA INSTANCIA
-        
-        finance_data = finance_reporter.fetch_all_data()
+        finance_reporter = FinanceReport(self.SUPABASE_URL, self.SUPABASE_KEY, cache=self.cache, client=self.client,
+                                         aggregates=self.finance_aggregates,
+                                         invoice_horizon_months=self.invoice_horizon_months)
+        habit_tracker = HabitTracker(self.SUPABASE_URL, self.SUPABASE_KEY, cache=self.cache, client=self.client,
+                                     aggregates=self.habit_aggregates)
+        workout_reporter = WorkoutReport(self.SUPABASE_URL, self.SUPABASE_KEY, cache=self.cache, client=self.client) # NOVA INSTANCIA
+        
+        # Todas as consultas independentes dos três relatórios são disparadas juntas:
+        # o tempo total passa a ser o da consulta mais lenta, não a soma de todas.
+        print("Buscando dados de Finanças, Hábitos e Treino em paralelo...")
+        scheduler = FetchScheduler(max_workers=self.max_concurrency, timeout=self.query_timeout)
+        try:
+            jobs = {**finance_reporter.fetch_jobs(), **habit_tracker.fetch_jobs(), **workout_reporter.fetch_jobs()}
+            results = scheduler.run(jobs)
+        finally:
+            scheduler.shutdown()
+
+        failed = [name for name, value in results.items() if isinstance(value, Exception)]
+        print("⏱️ Consultas ao Supabase (por tabela):")
+        print(STATS.report())
+        if failed:
+            print(f"⚠️ Buscas com falha: {', '.join(failed)}")
+
+        finance_data = finance_reporter.process_results(results)
+        habits_data = habit_tracker.process_results(results)
+        weekly_data_sets = workout_reporter.process_results(results)
         
         if not finance_data:
             print("❌ Falha ao buscar dados financeiros. Abortando geração do PDF.")
@@ -1853,13 +2195,13 @@ class MasterReportGenerator:
 
         # 2. Gerar Figuras (Figuras em si, sem salvar)
         print("✅ Gerando figura do Relatório de Hábitos (Página 1)...")
-        fig_habit = habit_tracker.generate_figure()
+        fig_habit = habit_tracker.generate_figure(habits_data)
 
         print("✅ Gerando figura do Relatório Financeiro (Página 2)...")
         fig_finance = finance_reporter.generate_finance_page(finance_data)
         
         print("✅ Gerando figura do Relatório de Treino (Página 3)...")
-        fig_workout = workout_reporter.generate_figure() # NOVA CHAMADA
+        fig_workout = workout_reporter.generate_figure(weekly_data_sets) # NOVA CHAMADA
         
         # 3. Salvar tudo em um único PDF
         print(f"📄 Salvando figuras no arquivo PDF: {output_filename}")
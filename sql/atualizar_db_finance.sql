@@ -0,0 +1,6 @@
+-- Restrições usadas pelos upserts de atualizar_db_finance.py (on_conflict="data_registro").
+-- Um registro por dia em cada tabela. Se já houver dias duplicados, remova-os antes
+-- (mantendo o de maior id) ou o ALTER TABLE falha.
+
+ALTER TABLE cc_e_dividas ADD CONSTRAINT cc_e_dividas_data_registro_key UNIQUE (data_registro);
+ALTER TABLE reserva ADD CONSTRAINT reserva_data_registro_key UNIQUE (data_registro);
@@ -0,0 +1,51 @@
+-- Agregações (mensais e a diária do fluxo de caixa) usadas pelo FinanceReport (aggregates.SupabaseAggregates).
+-- Rodar uma vez no SQL Editor do Supabase. As views são lidas pelo PostgREST como tabelas,
+-- então o relatório baixa (meses x categorias) linhas em vez de todo o histórico.
+
+-- Soma por (mês, tipo_id). total_abs = soma dos valores absolutos (usada nos totais de saídas).
+CREATE OR REPLACE VIEW financ_regis_mensal AS
+SELECT
+    date_trunc('month', data_registro)::date AS mes,
+    tipo_id,
+    SUM(valor)       AS total,
+    SUM(ABS(valor))  AS total_abs,
+    COUNT(*)         AS n_registros
+FROM financ_regis
+GROUP BY 1, 2;
+
+-- Soma por (dia, tipo_id), para o gráfico de fluxo de caixa diário (lido só a partir do mês anterior).
+CREATE OR REPLACE VIEW financ_regis_diario AS
+SELECT
+    data_registro::date AS data_registro,
+    tipo_id,
+    SUM(valor)       AS total,
+    SUM(ABS(valor))  AS total_abs
+FROM financ_regis
+GROUP BY 1, 2;
+
+-- Parcelas ainda não pagas, por mês de vencimento.
+CREATE OR REPLACE VIEW parcelas_abertas_mensal AS
+SELECT
+    date_trunc('month', data_vencimento)::date AS mes,
+    SUM(valor_parcela) AS total
+FROM compras_prazo_parcelas
+WHERE pago = false
+GROUP BY 1;
+
+-- Último saldo de cc_e_dividas registrado em cada mês.
+CREATE OR REPLACE VIEW cc_e_dividas_mensal AS
+SELECT DISTINCT ON (date_trunc('month', data_registro))
+    date_trunc('month', data_registro)::date AS mes,
+    valor
+FROM cc_e_dividas
+ORDER BY date_trunc('month', data_registro), data_registro DESC, id DESC;
+
+-- Saldo acumulado da reserva no fim de cada mês (soma de todos os registros até o mês).
+CREATE OR REPLACE VIEW reserva_saldo_mensal AS
+SELECT
+    date_trunc('month', data_registro)::date AS mes,
+    SUM(SUM(valor)) OVER (ORDER BY date_trunc('month', data_registro)) AS saldo
+FROM reserva
+GROUP BY 1;
+
+GRANT SELECT ON financ_regis_mensal, financ_regis_diario, parcelas_abertas_mensal, cc_e_dividas_mensal, reserva_saldo_mensal TO anon, authenticated;
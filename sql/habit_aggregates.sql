@@ -0,0 +1,27 @@
+-- Agregações usadas pelo HabitTracker (aggregates.SupabaseAggregates.habit_monthly / habit_daily).
+-- Rodar uma vez no SQL Editor do Supabase. Taxas mensais, tabela, ranking e resumo da página de
+-- hábitos saem da view mensal ((meses x hábitos) linhas) e a visão dos últimos 365 dias da diária
+-- (uma linha por dia); registros diários só do mês exibido e da janela das sequências.
+
+-- Dias distintos com registro, dias com nível > 0 e soma dos níveis por (mês, hábito).
+CREATE OR REPLACE VIEW habitos_registros_mensal AS
+SELECT
+    date_trunc('month', data_registro)::date AS mes,
+    habito_id,
+    COUNT(DISTINCT data_registro)                          AS dias_feitos,
+    COUNT(DISTINCT data_registro) FILTER (WHERE nivel > 0) AS dias_com_nivel,
+    COALESCE(SUM(nivel), 0)                                AS soma_niveis
+FROM habitos_registros
+GROUP BY 1, 2;
+
+-- Hábitos ativos feitos em cada dia (distintos), para a visão dos últimos 365 dias.
+CREATE OR REPLACE VIEW habitos_registros_diario AS
+SELECT
+    r.data_registro,
+    COUNT(DISTINCT r.habito_id) AS habitos_feitos
+FROM habitos_registros r
+JOIN habitos h ON h.id = r.habito_id
+WHERE h.ativo
+GROUP BY r.data_registro;
+
+GRANT SELECT ON habitos_registros_mensal, habitos_registros_diario TO anon, authenticated;
@@ -0,0 +1,28 @@
+-- Resumo mensal mantido por atualizar_db_finance.py e lido pelo FinanceReport (aggregates.RollupAggregates).
+-- O job recalcula a cada execução os meses da janela recente (mês corrente e o anterior, ou mais)
+-- e as faturas dos meses seguintes;
+-- `python atualizar_db_finance.py --resumo` reconstrói tudo a partir das tabelas brutas.
+-- O relatório lê algumas dezenas de linhas em vez de financ_regis, reserva, cc_e_dividas e parcelas.
+
+-- Uma linha por mês. Saldos em reais, como nas tabelas de origem; nulo = sem registro no mês.
+CREATE TABLE IF NOT EXISTS resumo_mensal (
+    mes              date PRIMARY KEY,          -- primeiro dia do mês
+    reserva_saldo    numeric,                   -- soma acumulada de `reserva` até o fim do mês
+    divida           numeric,                   -- último saldo de `cc_e_dividas` do mês
+    faturas_abertas  numeric NOT NULL DEFAULT 0, -- parcelas não pagas com vencimento no mês
+    atualizado_em    timestamptz NOT NULL DEFAULT now()
+);
+
+-- Soma de `financ_regis` por (mês, tipo_id), mesmo formato da view financ_regis_mensal.
+CREATE TABLE IF NOT EXISTS resumo_mensal_tipo (
+    mes        date NOT NULL,
+    tipo_id    integer NOT NULL,
+    total      numeric NOT NULL,
+    total_abs  numeric NOT NULL,
+    PRIMARY KEY (mes, tipo_id)
+);
+
+-- O relatório só lê; as escritas ficam com o papel do job (chave service_role em
+-- SUPABASE_SERVICE_ROLE_KEY, ver atualizar_db_finance.py), nunca com a chave anon do repositório.
+GRANT SELECT ON resumo_mensal, resumo_mensal_tipo TO anon, authenticated;
+GRANT SELECT, INSERT, UPDATE, DELETE ON resumo_mensal, resumo_mensal_tipo TO service_role;
@@ -0,0 +1,78 @@
+"""Cliente Supabase compartilhado entre os relatórios e o job de atualização.
+
+Cada `create_client` abre sua própria sessão HTTP (e seu próprio handshake TLS).
+Aqui existe um único cliente por (url, chave), com um pool de conexões keep-alive
+e compressão de resposta, configurado em um só lugar.
+
+Com SUPABASE_BACKEND=offline no ambiente, o cliente devolvido é o backend local
+de supabase_offline.py, servido a partir do arquivo em SUPABASE_FIXTURES.
+"""
+import os
+import threading
+
+import httpx
+from supabase import create_client
+
+try:
+    from supabase import ClientOptions
+except ImportError:
+    from supabase.lib.client_options import ClientOptions
+
+# Deve acompanhar o max_workers do FetchScheduler para não enfileirar conexões
+DEFAULT_MAX_CONNECTIONS = 16
+DEFAULT_TIMEOUT = 60
+KEEPALIVE_EXPIRY = 60
+DEFAULT_FIXTURES_PATH = "fixtures.json"
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def build_http_client(max_connections=DEFAULT_MAX_CONNECTIONS, timeout=DEFAULT_TIMEOUT):
+    """Sessão httpx com pool keep-alive e respostas comprimidas (gzip)."""
+    try:
+        import h2  # noqa: F401 -- HTTP/2 só se o pacote opcional estiver instalado
+        http2 = True
+    except ImportError:
+        http2 = False
+
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=max_connections,
+                            max_keepalive_connections=max_connections,
+                            keepalive_expiry=KEEPALIVE_EXPIRY),
+        headers={"Accept-Encoding": "gzip, deflate"},
+        timeout=timeout,
+        http2=http2,
+        follow_redirects=True,
+    )
+
+
+def get_client(supabase_url, supabase_key, max_connections=DEFAULT_MAX_CONNECTIONS, timeout=DEFAULT_TIMEOUT):
+    """Devolve o cliente compartilhado para (url, chave), criando-o na primeira chamada."""
+    with _lock:
+        client = _clients.get((supabase_url, supabase_key))
+        if client is None and os.environ.get("SUPABASE_BACKEND", "").lower() == "offline":
+            from supabase_offline import OfflineClient
+            client = OfflineClient.from_file(os.environ.get("SUPABASE_FIXTURES", DEFAULT_FIXTURES_PATH))
+            _clients[(supabase_url, supabase_key)] = client
+        elif client is None:
+            try:
+                options = ClientOptions(httpx_client=build_http_client(max_connections, timeout))
+            except TypeError:
+                # supabase-py sem 'httpx_client': fica a sessão padrão, que também é keep-alive
+                options = None
+            if options is None:
+                client = create_client(supabase_url, supabase_key)
+            else:
+                client = create_client(supabase_url, supabase_key, options=options)
+            _clients[(supabase_url, supabase_key)] = client
+        return client
+
+
+def close_clients():
+    """Fecha as sessões HTTP de todos os clientes compartilhados."""
+    with _lock:
+        for client in _clients.values():
+            if hasattr(client, "postgrest"):
+                client.postgrest.session.close()
+        _clients.clear()
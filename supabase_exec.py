@@ -0,0 +1,155 @@
+"""Execução instrumentada das consultas ao Supabase: retentativas, prazo e estatísticas.
+
+Toda requisição passa por `execute(query, table)`, que:
+- repete com backoff exponencial (e jitter) os erros transitórios (rede, timeout,
+  5xx/429, pool do PostgREST esgotado); erros de consulta sobem na primeira vez;
+- respeita o prazo da thread atual (`deadline`): uma retentativa que terminaria
+  depois do prazo não é feita, e a busca falha com TimeoutError;
+- registra em `STATS` latência, linhas e bytes por tabela, para ver qual consulta
+  domina o tempo de execução.
+"""
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+from postgrest.exceptions import APIError
+
+# Códigos do PostgREST/Postgres que indicam falha passageira do servidor, não da consulta
+TRANSIENT_API_CODES = {
+    "PGRST000", "PGRST001", "PGRST002", "PGRST003",  # conexão com o banco / pool esgotado
+    "57014",  # statement_timeout
+    "429", "500", "502", "503", "504",
+}
+
+
+class RetryPolicy:
+    """Quantas tentativas fazer e quanto esperar entre elas (backoff exponencial com jitter)."""
+
+    def __init__(self, attempts=4, base_delay=0.5, max_delay=8.0, jitter=0.25):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, attempt):
+        """Espera antes da tentativa `attempt` + 1 (attempt começa em 1)."""
+        delay = min(self.base_delay * 2 ** (attempt - 1), self.max_delay)
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+
+def is_transient(exc):
+    """True para falhas de rede/servidor que valem uma nova tentativa."""
+    if isinstance(exc, (httpx.TransportError, ConnectionError)):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    if isinstance(exc, APIError):
+        return str(exc.code) in TRANSIENT_API_CODES
+    return False
+
+
+class QueryStats:
+    """Acumula, por tabela, chamadas, retentativas, falhas, tempo, linhas e bytes recebidos."""
+
+    FIELDS = ("calls", "retries", "failures", "seconds", "rows", "bytes")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tables = {}
+
+    def record(self, table, seconds, rows=0, nbytes=0, retries=0, failed=False):
+        with self.lock:
+            entry = self.tables.setdefault(table, dict.fromkeys(self.FIELDS, 0))
+            entry["calls"] += 1
+            entry["retries"] += retries
+            entry["failures"] += int(failed)
+            entry["seconds"] += seconds
+            entry["rows"] += rows
+            entry["bytes"] += nbytes
+
+    def snapshot(self):
+        with self.lock:
+            return {table: dict(entry) for table, entry in self.tables.items()}
+
+    def reset(self):
+        with self.lock:
+            self.tables.clear()
+
+    def report(self):
+        """Tabela de texto, da tabela mais lenta para a mais rápida."""
+        rows = sorted(self.snapshot().items(), key=lambda item: item[1]["seconds"], reverse=True)
+        lines = [f"{'tabela':<28}{'req':>5}{'retry':>6}{'falha':>6}{'tempo(s)':>10}{'linhas':>9}{'KB':>9}"]
+        for table, e in rows:
+            lines.append(f"{table:<28}{e['calls']:>5}{e['retries']:>6}{e['failures']:>6}"
+                         f"{e['seconds']:>10.2f}{e['rows']:>9}{e['bytes'] / 1024:>9.1f}")
+        return "\n".join(lines)
+
+
+# Estatísticas do processo inteiro (relatório ou job); zere com STATS.reset() entre execuções
+STATS = QueryStats()
+
+_local = threading.local()
+
+
+def current_deadline():
+    """Prazo (time.monotonic) da thread atual, ou None se não houver."""
+    return getattr(_local, "deadline", None)
+
+
+@contextmanager
+def deadline_at(moment):
+    """Define o prazo absoluto da thread atual (um prazo já mais curto é mantido)."""
+    previous = current_deadline()
+    if moment is not None and (previous is None or moment < previous):
+        _local.deadline = moment
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def deadline(seconds):
+    """Prazo relativo: `with deadline(30): ...`."""
+    return deadline_at(time.monotonic() + seconds if seconds is not None else None)
+
+
+def _payload_bytes(data):
+    # O postgrest-py não expõe o corpo bruto; o tamanho é o do JSON re-serializado (aproximado)
+    return len(json.dumps(data, default=str).encode("utf-8")) if data else 0
+
+
+def execute(query, table, policy=DEFAULT_POLICY, stats=STATS):
+    """Executa o query builder com retentativas e registra as estatísticas de `table`."""
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        attempt += 1
+        limit = current_deadline()
+        if limit is not None and time.monotonic() >= limit:
+            stats.record(table, time.monotonic() - started, retries=attempt - 1, failed=True)
+            raise TimeoutError(f"Prazo esgotado antes de consultar '{table}'")
+        try:
+            response = query.execute()
+        except Exception as e:
+            wait = policy.delay(attempt)
+            retry = is_transient(e) and attempt < policy.attempts
+            if retry and limit is not None and time.monotonic() + wait >= limit:
+                stats.record(table, time.monotonic() - started, retries=attempt - 1, failed=True)
+                raise TimeoutError(f"Prazo esgotado consultando '{table}' após {attempt} tentativa(s)") from e
+            if not retry:
+                stats.record(table, time.monotonic() - started, retries=attempt - 1, failed=True)
+                raise
+            print(f"  ⚠️ '{table}': {type(e).__name__} na tentativa {attempt}, repetindo em {wait:.1f}s...")
+            time.sleep(wait)
+            continue
+
+        data = response.data
+        stats.record(table, time.monotonic() - started, rows=len(data) if isinstance(data, list) else int(bool(data)),
+                     nbytes=_payload_bytes(data), retries=attempt - 1)
+        return response
@@ -0,0 +1,230 @@
+"""Camada de busca paginada no Supabase (PostgREST).
+
+O PostgREST limita a quantidade de linhas devolvidas por requisição (max-rows,
+1000 por padrão no Supabase), então um select("*") em uma tabela grande vem
+truncado sem nenhum aviso. Aqui as tabelas são percorridas com paginação
+keyset (WHERE chave > última_chave ORDER BY chave LIMIT n): cada página custa
+o mesmo que a primeira e nenhuma linha é pulada ou repetida.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import pandas as pd
+
+from supabase_exec import current_deadline, deadline, deadline_at, execute
+
+# Linhas pedidas por página. O servidor pode devolver menos (max-rows menor que isto), então
+# só uma página vazia marca o fim da tabela.
+DEFAULT_PAGE_SIZE = 1000
+# Valores por filtro in_() em uma requisição (mantém a URL bem abaixo do limite do gateway)
+IN_CHUNK_SIZE = 200
+
+
+class ColumnRegistry:
+    """
+    Projeção de colunas por tabela, montada a partir do que cada consumidor declara.
+
+    Os consumidores (gráficos, cálculos) declaram {tabela: colunas}; a busca pede ao PostgREST
+    só a união dessas colunas. Tabela sem declaração continua com select("*").
+    """
+
+    def __init__(self, declarations=None):
+        self._columns = {}
+        if declarations:
+            self.require_all(declarations)
+
+    def require(self, table, columns):
+        merged = self._columns.setdefault(table, {})
+        merged.update(dict.fromkeys(columns))
+
+    def require_all(self, declarations):
+        """Registra {consumidor: {tabela: colunas}}."""
+        for tables in declarations.values():
+            for table, columns in tables.items():
+                self.require(table, columns)
+
+    def select(self, table, *extra):
+        """String de projeção para o select(), com colunas extras (chaves, filtros) se preciso."""
+        columns = self._columns.get(table)
+        if not columns:
+            return "*"
+        return ", ".join(dict.fromkeys(list(columns) + list(extra)))
+
+
+def split_columns(columns):
+    """Separa uma projeção em colunas, sem quebrar recursos embutidos como 'tabela(a, b)'."""
+    parts, depth, current = [], 0, ""
+    for char in columns:
+        if char == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+            continue
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def _apply_filters(query, filters):
+    """Aplica filtros no formato [(operador, coluna, valor), ...] ao query builder."""
+    for op, column, value in filters or ():
+        query = getattr(query, op)(column, value)
+    return query
+
+
+def ensure_columns(columns, keys):
+    """Garante que as colunas `keys` (chave de paginação, coluna de janela) estejam na projeção."""
+    if columns.strip() == "*":
+        return columns
+    selected = split_columns(columns)
+    missing = [k for k in keys if k not in selected]
+    return ", ".join(selected + missing)
+
+
+def _apply_keyset(query, keys, last_row):
+    """Restringe o query às linhas depois de `last_row`, para chave simples ou composta (data, id)."""
+    if len(keys) == 1:
+        return query.gt(keys[0], last_row[keys[0]])
+    # Chave composta: (k1 > v1) OR (k1 = v1 AND k2 > v2). Valores entre aspas por causa de ':' e '+' nas datas.
+    k1, k2 = keys
+    v1, v2 = last_row[k1], last_row[k2]
+    return query.or_(f'{k1}.gt."{v1}",and({k1}.eq."{v1}",{k2}.gt.{v2})')
+
+
+def iter_pages(client, table, columns="*", key="id", page_size=DEFAULT_PAGE_SIZE, filters=None, start_after=None):
+    """
+    Gera as páginas (listas de dicts) de `table`, ordenadas pela chave de paginação.
+
+    `key` é uma coluna única ('id') ou uma tupla ('data_registro', 'id') para percorrer por data
+    com o id como desempate. `start_after` é a linha (ou o valor da chave simples) a partir da
+    qual continuar.
+    """
+    keys = (key,) if isinstance(key, str) else tuple(key)
+    columns = ensure_columns(columns, keys)
+
+    last_row = start_after
+    if last_row is not None and not isinstance(last_row, dict):
+        last_row = {keys[0]: last_row}
+
+    while True:
+        query = _apply_filters(client.table(table).select(columns), filters)
+        if last_row is not None:
+            query = _apply_keyset(query, keys, last_row)
+        for k in keys:
+            query = query.order(k)
+        page = execute(query.limit(page_size), table).data or []
+
+        # Página curta não é o fim: com max-rows < page_size todas as páginas vêm curtas
+        if not page:
+            return
+        yield page
+        last_row = page[-1]
+
+
+def fetch_records(client, table, **kwargs):
+    """Busca a tabela inteira (paginada) como lista de dicts. Use só em tabelas pequenas."""
+    return [row for page in iter_pages(client, table, **kwargs) for row in page]
+
+
+def fetch_in_chunks(client, table, column, values, columns="*", chunk_size=IN_CHUNK_SIZE, max_workers=4):
+    """
+    Busca as linhas com `column` em `values`, dividindo a lista em blocos de `chunk_size`.
+
+    Um único .in_() com milhares de ids estoura o limite de tamanho de URL; os blocos são
+    consultados em paralelo (pool próprio, para poder ser chamado de dentro do FetchScheduler).
+    """
+    values = list(dict.fromkeys(values))
+    chunks = [values[i:i + chunk_size] for i in range(0, len(values), chunk_size)]
+    if not chunks:
+        return []
+
+    # As threads do pool herdam o prazo da busca que as disparou
+    parent_deadline = current_deadline()
+
+    def fetch_chunk(chunk):
+        with deadline_at(parent_deadline):
+            return fetch_records(client, table, columns=columns, filters=[("in_", column, chunk)])
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks)), thread_name_prefix="chunk") as pool:
+        return [row for part in pool.map(fetch_chunk, chunks) for row in part]
+
+
+def fetch_dataframe(client, table, parse_dates=(), **kwargs):
+    """
+    Busca a tabela inteira montando o DataFrame página a página.
+
+    Cada página vira um pedaço de DataFrame (com as datas já convertidas) e a lista de dicts é
+    descartada em seguida, então o pico de memória é uma página de JSON, não a tabela toda.
+    """
+    chunks = []
+    for page in iter_pages(client, table, **kwargs):
+        chunk = pd.DataFrame.from_records(page)
+        for col in parse_dates:
+            if col in chunk.columns:
+                chunk[col] = pd.to_datetime(chunk[col])
+        chunks.append(chunk)
+
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True)
+
+
+class FetchScheduler:
+    """
+    Executa buscas independentes em paralelo (pool de threads).
+
+    `max_workers` limita quantas consultas ficam abertas ao mesmo tempo e `timeout` é o tempo
+    máximo de espera por cada busca, contado a partir de quando ela começa a rodar. Uma busca
+    que falha ou estoura o tempo não derruba as outras: o erro vira o resultado dela. O mesmo
+    prazo vale dentro da busca, para as retentativas de `supabase_exec.execute`.
+    """
+
+    def __init__(self, max_workers=8, timeout=60):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+
+    def submit_all(self, jobs):
+        """Dispara todas as buscas {nome: função sem argumentos} sem esperar por elas."""
+        submitted = {}
+        for name, fn in jobs.items():
+            started = {}
+
+            def run(fn=fn, started=started):
+                started['at'] = time.monotonic()
+                with deadline(self.timeout):
+                    return fn()
+
+            submitted[name] = (self.executor.submit(run), started)
+        return submitted
+
+    def gather(self, submitted):
+        """Espera as buscas disparadas e devolve {nome: resultado ou exceção}."""
+        results = {}
+        for name, (future, started) in submitted.items():
+            try:
+                while 'at' not in started and not future.done():
+                    time.sleep(0.005) # ainda na fila do pool
+                remaining = started.get('at', time.monotonic()) + self.timeout - time.monotonic()
+                results[name] = future.result(timeout=max(remaining, 0))
+            except FutureTimeoutError:
+                results[name] = TimeoutError(f"Busca '{name}' excedeu {self.timeout}s")
+            except Exception as e:
+                results[name] = e
+        return results
+
+    def run(self, jobs):
+        return self.gather(self.submit_all(jobs))
+
+    def shutdown(self):
+        # Buscas presas não são esperadas; as que ainda estão na fila são canceladas
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def unwrap(results, name):
+    """Devolve o resultado de uma busca do FetchScheduler, relançando a exceção se ela falhou."""
+    value = results[name]
+    if isinstance(value, Exception):
+        raise value
+    return value
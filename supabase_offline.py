@@ -0,0 +1,420 @@
+"""Backend local que imita o cliente Supabase, para rodar relatório e job sem rede.
+
+Os dados vêm de um arquivo de fixtures JSON ({tabela: [linhas]}), que pode ser
+gravado a partir do projeto real (`record`) ou gerado sinteticamente (`synthetic`):
+
+    python supabase_offline.py record fixtures.json
+    python supabase_offline.py synthetic fixtures.json --days 730
+
+Com SUPABASE_BACKEND=offline e SUPABASE_FIXTURES=fixtures.json no ambiente,
+`supabase_client.get_client` devolve um OfflineClient no lugar do cliente real,
+então relat_cons.py e atualizar_db_finance.py rodam sem alteração e com tempos
+reproduzíveis. Os filtros usados no projeto (eq, neq, gt, gte, lt, lte, ilike,
+in_, not_, or_, order, limit) são avaliados localmente, com o mesmo limite de linhas
+por resposta do PostgREST.
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import re
+import threading
+from datetime import datetime, timedelta
+
+from postgrest.exceptions import APIError
+
+from supabase_fetch import split_columns
+
+# Mesmo max-rows padrão do Supabase, para exercitar a paginação como em produção
+DEFAULT_MAX_ROWS = 1000
+
+# Tabelas lidas ou escritas por relat_cons.py e atualizar_db_finance.py
+FIXTURE_TABLES = [
+    "tipo", "financ_regis", "cc_e_dividas", "reserva", "compras_a_prazo", "compras_prazo_parcelas",
+    "resumo_mensal", "resumo_mensal_tipo",
+    "habitos", "habitos_registros",
+    "exercicios", "registros_treino", "registro_exercicios", "peso_corporal", "configuracao_rank_forca",
+]
+
+# Tabelas de sql/resumo_mensal.sql: gravadas só se o projeto já tiver aplicado o script
+OPTIONAL_FIXTURE_TABLES = {"resumo_mensal", "resumo_mensal_tipo"}
+
+# Relacionamentos (FKs) usados em recursos embutidos: (tabela, embutida) -> (coluna local, coluna remota, muitos?)
+RELATIONSHIPS = {
+    ("registros_treino", "registro_exercicios"): ("id", "registro_treino_id", True),
+    ("registro_exercicios", "exercicios"): ("exercicio_id", "id", False),
+    ("registro_exercicios", "registros_treino"): ("registro_treino_id", "id", False),
+}
+
+# Views de sql/finance_aggregates.sql e sql/habit_aggregates.sql: calculadas sobre as fixtures com o SQL equivalente de SQLiteAggregates
+VIEW_QUERIES = {
+    "financ_regis_mensal": ("MONTHLY_TOTALS_SQL", ["mes", "tipo_id", "total", "total_abs"]),
+    "financ_regis_diario": ("DAILY_TOTALS_SQL", ["data_registro", "tipo_id", "total", "total_abs"]),
+    "parcelas_abertas_mensal": ("UNPAID_INSTALLMENTS_SQL", ["mes", "total"]),
+    "cc_e_dividas_mensal": ("MONTHLY_DEBT_SQL", ["mes", "valor"]),
+    "reserva_saldo_mensal": ("RESERVE_BALANCE_SQL", ["mes", "saldo"]),
+    "habitos_registros_mensal": ("HABIT_MONTHLY_SQL", ["mes", "habito_id", "dias_feitos", "dias_com_nivel", "soma_niveis"]),
+    "habitos_registros_diario": ("HABIT_DAILY_SQL", ["data_registro", "habitos_feitos"]),
+}
+VIEW_SOURCE_TABLES = ["financ_regis", "compras_prazo_parcelas", "cc_e_dividas", "reserva", "habitos", "habitos_registros"]
+
+
+class OfflineResponse:
+    def __init__(self, data):
+        self.data = data
+        self.count = None
+
+
+def _coerce(row_value, filter_value):
+    """Converte o valor do filtro para o tipo da coluna (a API recebe tudo como texto)."""
+    if isinstance(row_value, bool):
+        return str(filter_value).lower() in ("true", "t", "1")
+    if isinstance(row_value, (int, float)):
+        try:
+            return float(filter_value)
+        except (TypeError, ValueError):
+            return filter_value
+    return str(filter_value)
+
+
+def _compare(row_value, op, filter_value):
+    if op == "is":
+        return row_value is None if str(filter_value).lower() == "null" else row_value == _coerce(row_value, filter_value)
+    if row_value is None:
+        return False
+    if op == "in":
+        return any(row_value == _coerce(row_value, v) for v in filter_value)
+    if op in ("like", "ilike"):
+        pattern = "^" + re.escape(str(filter_value)).replace("%", ".*").replace("_", ".") + "$"
+        return re.match(pattern, str(row_value), re.IGNORECASE if op == "ilike" else 0) is not None
+
+    value = _coerce(row_value, filter_value)
+    if isinstance(value, str) and not isinstance(row_value, str):
+        row_value = str(row_value)
+    return {
+        "eq": row_value == value, "neq": row_value != value,
+        "gt": row_value > value, "gte": row_value >= value,
+        "lt": row_value < value, "lte": row_value <= value,
+    }[op]
+
+
+def _split_logic(expr):
+    """Separa os termos de uma árvore lógica do PostgREST, respeitando parênteses e aspas."""
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in expr:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char in "()":
+            depth += 1 if char == "(" else -1
+        elif not quoted and char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _parse_logic(expr):
+    """Converte 'a.gt."x",and(a.eq."x",b.gt.1)' em um predicado sobre a linha."""
+    terms = []
+    for term in _split_logic(expr):
+        match = re.match(r"^(and|or)\((.*)\)$", term)
+        if match:
+            inner = _parse_logic(match.group(2))
+            terms.append((lambda inner: (lambda row: all(p(row) for p in inner)))(inner) if match.group(1) == "and"
+                         else (lambda inner: (lambda row: any(p(row) for p in inner)))(inner))
+            continue
+        column, op, value = term.split(".", 2)
+        value = value[1:-1] if value.startswith('"') and value.endswith('"') else value
+        terms.append((lambda column, op, value: (lambda row: _compare(row.get(column), op, value)))(column, op, value))
+    return terms
+
+
+class OfflineQuery:
+    """Query builder com a mesma interface encadeável do postgrest-py."""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.columns = "*"
+        self.predicates = []
+        self.orders = []
+        self.row_limit = None
+        self.operation = "select"
+        self.payload = None
+        self.on_conflict = None
+        self.negate_next = False
+
+    # --- leitura ---
+    def select(self, columns="*", **kwargs):
+        self.columns = columns
+        return self
+
+    def _where(self, column, op, value):
+        negate, self.negate_next = self.negate_next, False
+        self.predicates.append(lambda row: _compare(row.get(column), op, value) != negate)
+        return self
+
+    @property
+    def not_(self):
+        """Nega o próximo filtro, como `.not_.in_(...)` do postgrest-py."""
+        self.negate_next = True
+        return self
+
+    def eq(self, column, value): return self._where(column, "eq", value)
+    def neq(self, column, value): return self._where(column, "neq", value)
+    def gt(self, column, value): return self._where(column, "gt", value)
+    def gte(self, column, value): return self._where(column, "gte", value)
+    def lt(self, column, value): return self._where(column, "lt", value)
+    def lte(self, column, value): return self._where(column, "lte", value)
+    def like(self, column, pattern): return self._where(column, "like", pattern)
+    def ilike(self, column, pattern): return self._where(column, "ilike", pattern)
+    def is_(self, column, value): return self._where(column, "is", value)
+    def in_(self, column, values): return self._where(column, "in", list(values))
+
+    def or_(self, filters, **kwargs):
+        terms = _parse_logic(filters)
+        self.predicates.append(lambda row: any(term(row) for term in terms))
+        return self
+
+    def order(self, column, desc=False, **kwargs):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, size, **kwargs):
+        self.row_limit = size
+        return self
+
+    # --- escrita ---
+    def insert(self, rows, **kwargs):
+        self.operation, self.payload = "insert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict="", **kwargs):
+        self.operation, self.payload = "upsert", rows if isinstance(rows, list) else [rows]
+        self.on_conflict = [c.strip() for c in on_conflict.split(",") if c.strip()] or ["id"]
+        return self
+
+    def update(self, values, **kwargs):
+        self.operation, self.payload = "update", values
+        return self
+
+    def delete(self, **kwargs):
+        self.operation = "delete"
+        return self
+
+    def execute(self):
+        with self.client.lock:
+            rows = self.client.tables.get(self.table)
+            if rows is None and self.table in VIEW_QUERIES and self.operation == "select":
+                rows = self.client.view_rows(self.table)
+            if rows is None:
+                raise APIError({"message": f'relation "public.{self.table}" does not exist', "code": "42P01"})
+            return OfflineResponse(getattr(self, f"_execute_{self.operation}")(rows))
+
+    def _matching(self, rows):
+        return [row for row in rows if all(p(row) for p in self.predicates)]
+
+    def _execute_select(self, rows):
+        result = self._matching(rows)
+        for column, desc in reversed(self.orders):
+            result.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        limit = min(self.row_limit or self.client.max_rows, self.client.max_rows)
+        return [self.client.project(self.table, row, self.columns) for row in result[:limit]]
+
+    def _execute_insert(self, rows):
+        inserted = [self.client.with_id(self.table, dict(row)) for row in self.payload]
+        rows.extend(inserted)
+        return copy.deepcopy(inserted)
+
+    def _execute_upsert(self, rows):
+        written = []
+        for new_row in self.payload:
+            existing = next((row for row in rows if all(row.get(c) == new_row.get(c) for c in self.on_conflict)), None)
+            if existing is not None:
+                existing.update(new_row)
+                written.append(existing)
+            else:
+                row = self.client.with_id(self.table, dict(new_row))
+                rows.append(row)
+                written.append(row)
+        return copy.deepcopy(written)
+
+    def _execute_update(self, rows):
+        matched = self._matching(rows)
+        for row in matched:
+            row.update(self.payload)
+        return copy.deepcopy(matched)
+
+    def _execute_delete(self, rows):
+        matched = self._matching(rows)
+        matched_ids = {id(row) for row in matched}
+        rows[:] = [row for row in rows if id(row) not in matched_ids]
+        return copy.deepcopy(matched)
+
+
+class OfflineClient:
+    """Substituto do cliente Supabase servido a partir de fixtures em memória."""
+
+    def __init__(self, tables, max_rows=DEFAULT_MAX_ROWS):
+        self.tables = {name: [dict(row) for row in rows] for name, rows in tables.items()}
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    def table(self, table_name):
+        return OfflineQuery(self, table_name)
+
+    from_ = table
+
+    def view_rows(self, view):
+        """Linhas de uma view agregada, recalculadas a partir das tabelas atuais."""
+        from aggregates import SQLiteAggregates
+
+        sql_name, columns = VIEW_QUERIES[view]
+        aggregates = SQLiteAggregates.from_records({t: self.tables.get(t, []) for t in VIEW_SOURCE_TABLES})
+        return [dict(zip(columns, row)) for row in aggregates._query(getattr(aggregates, sql_name))]
+
+    def with_id(self, table, row):
+        if "id" not in row:
+            row["id"] = max((r.get("id") or 0 for r in self.tables[table]), default=0) + 1
+        return row
+
+    def project(self, table, row, columns):
+        """Aplica a projeção do select(), resolvendo recursos embutidos pelos RELATIONSHIPS."""
+        if columns.strip() == "*":
+            return copy.deepcopy(row)
+        projected = {}
+        for column in split_columns(columns):
+            match = re.match(r"^(\w+)\((.*)\)$", column, re.DOTALL)
+            if not match:
+                projected[column] = copy.deepcopy(row.get(column))
+                continue
+            embedded, embedded_columns = match.groups()
+            local, remote, many = RELATIONSHIPS[(table, embedded)]
+            related = [r for r in self.tables.get(embedded, []) if r.get(remote) == row.get(local)]
+            related = [self.project(embedded, r, embedded_columns) for r in related]
+            projected[embedded] = related if many else (related[0] if related else None)
+        return projected
+
+
+# --- Gravação e geração de fixtures ---
+
+def record_fixtures(client, path, tables=FIXTURE_TABLES):
+    """Baixa (paginado) as tabelas do projeto real e grava o arquivo de fixtures.
+
+    Tabelas de OPTIONAL_FIXTURE_TABLES que não existem no projeto ficam de fora do arquivo.
+    """
+    from supabase_fetch import fetch_records
+
+    fixtures = {}
+    for table in tables:
+        try:
+            fixtures[table] = fetch_records(client, table)
+        except APIError as e:
+            if table not in OPTIONAL_FIXTURE_TABLES:
+                raise
+            print(f"  ⚠️ {table}: não gravada ({e.message})")
+            continue
+        print(f"  ✅ {table}: {len(fixtures[table])} linhas gravadas")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixtures, f, ensure_ascii=False)
+    return fixtures
+
+
+def synthetic_fixtures(days=730, seed=0, today=None):
+    """Gera dados sintéticos com o formato das tabelas reais, para `days` dias de histórico."""
+    rng = random.Random(seed)
+    today = (today or datetime.now()).replace(hour=12, minute=0, second=0, microsecond=0)
+    dates = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+    fixtures = {table: [] for table in FIXTURE_TABLES}
+
+    fixtures["tipo"] = [{"id": i, "nome_tipo": nome} for i, nome in enumerate(
+        ["Entradas", "Mercado", "Moradia", "Transporte", "Lazer", "Saúde", "Pagamento Dívida", "Reserva"], start=1)]
+
+    for day in dates:
+        iso = day.date().isoformat()
+        if day.day == 5:
+            fixtures["financ_regis"].append({"tipo_id": 1, "valor": 8500.0, "nome": "Salário", "data_registro": iso})
+            fixtures["financ_regis"].append({"tipo_id": 7, "valor": -1200.0, "nome": "Fatura cartão", "data_registro": iso})
+            fixtures["financ_regis"].append({"tipo_id": 8, "valor": -1000.0, "nome": "Reserva mensal", "data_registro": iso})
+        for _ in range(rng.randint(0, 4)):
+            fixtures["financ_regis"].append({"tipo_id": rng.randint(2, 6), "valor": -round(rng.uniform(5, 400), 2),
+                                             "nome": "Gasto", "data_registro": iso})
+        if rng.random() < 0.1:
+            fixtures["compras_a_prazo"].append({"valor": round(rng.uniform(100, 2000), 2), "data_registro": iso})
+        if day.day == 1:
+            fixtures["cc_e_dividas"].append({"valor": round(rng.uniform(2000, 9000), 2), "data_registro": iso})
+            fixtures["reserva"].append({"valor": 1000.0, "data_registro": iso})
+
+    for compra in fixtures["compras_a_prazo"]:
+        start = datetime.fromisoformat(compra["data_registro"])
+        for n in range(1, 7):
+            vencimento = (start + timedelta(days=30 * n)).date()
+            fixtures["compras_prazo_parcelas"].append({"valor_parcela": round(compra["valor"] / 6, 2),
+                                                       "data_vencimento": vencimento.isoformat(),
+                                                       "pago": vencimento < today.date()})
+
+    habit_names = ["Leitura", "Treino", "Meditação", "Inglês", "Dormir cedo", "Sem açúcar"]
+    fixtures["habitos"] = [{"id": i, "nome": nome, "ativo": True} for i, nome in enumerate(habit_names, start=1)]
+    for day in dates:
+        for habit in fixtures["habitos"]:
+            if rng.random() < 0.6:
+                fixtures["habitos_registros"].append({"habito_id": habit["id"], "data_registro": day.date().isoformat(),
+                                                      "nivel": rng.randint(1, 4)})
+
+    exercises = [("Supino reto", "Peitoral"), ("Agachamento livre", "Quadríceps"), ("Remada curvada", "Dorsal"),
+                 ("Push Press", "Deltóide"), ("Levantamento terra", "Posterior de Coxa"), ("Barra fixa", "Dorsal"),
+                 ("Rosca direta", "Bíceps"), ("Tríceps corda", "Tríceps"), ("Panturrilha em pé", "Panturrilha")]
+    fixtures["exercicios"] = [{"id": i, "nome": nome, "grupo_muscular_primario": grupo,
+                               "grupos_musculares_secundarios": ["Core"]} for i, (nome, grupo) in enumerate(exercises, start=1)]
+    fixtures["exercicios"].append({"id": 16, "nome": "HRR", "grupo_muscular_primario": "Cardio",
+                                   "grupos_musculares_secundarios": []})
+    for day in dates:
+        if rng.random() < 0.5:
+            session_id = len(fixtures["registros_treino"]) + 1
+            fixtures["registros_treino"].append({"id": session_id, "data_treino": (day + timedelta(hours=rng.randint(6, 20))).strftime("%Y-%m-%dT%H:%M:%S+00:00")})
+            for exercise_id in rng.sample(range(1, len(exercises) + 1), 4) + [16]:
+                for _ in range(3):
+                    fixtures["registro_exercicios"].append({
+                        "registro_treino_id": session_id, "exercicio_id": exercise_id,
+                        "peso": str(rng.randint(0, 5) if exercise_id == 6 else rng.randint(10, 140)),
+                        "repeticoes": str(rng.randint(20, 50) if exercise_id == 16 else rng.randint(4, 15)),
+                        "tempo": None,
+                    })
+
+    fixtures["peso_corporal"] = [{"peso_kg": 78.5, "data_registro": today.date().isoformat()}]
+    ranks = [("F", 0.0), ("E", 0.5), ("D", 0.75), ("C", 1.0), ("B", 1.25), ("A", 1.5), ("S", 2.0)]
+    fixtures["configuracao_rank_forca"] = [{"nome_exercicio": nome, "rank_nome": rank, "multiplo_pc": mult}
+                                           for nome, _ in exercises[:6] for rank, mult in ranks]
+
+    for table, rows in fixtures.items():
+        for i, row in enumerate(rows, start=1):
+            row.setdefault("id", i)
+    return fixtures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grava ou gera fixtures para o backend offline.")
+    parser.add_argument("mode", choices=["record", "synthetic"])
+    parser.add_argument("path")
+    parser.add_argument("--days", type=int, default=730, help="dias de histórico (synthetic)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", default=os.environ.get("SUPABASE_URL"), help="projeto a gravar (record)")
+    parser.add_argument("--key", default=os.environ.get("SUPABASE_KEY"))
+    args = parser.parse_args()
+
+    if args.mode == "record":
+        from supabase_client import get_client
+        record_fixtures(get_client(args.url, args.key), args.path)
+    else:
+        with open(args.path, "w", encoding="utf-8") as f:
+            json.dump(synthetic_fixtures(days=args.days, seed=args.seed), f, ensure_ascii=False)
+        print(f"Fixtures sintéticas gravadas em {args.path}")
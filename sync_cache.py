@@ -0,0 +1,238 @@
+"""Cache local (SQLite) com sincronização incremental das tabelas do Supabase.
+
+Cada tabela sincronizada guarda suas linhas como JSON, indexadas pelo `id`, e uma
+marca d'água (maior `id` já baixado). A cada execução só são buscadas as linhas
+com `id` acima da marca d'água, mais uma janela recente (`window_column >=
+window_start`) que é baixada de novo e substitui o que estava no cache, para
+pegar edições e exclusões de registros recentes.
+
+Para tabelas de log por data (ex.: habitos_registros), `load_closed_years` guarda à parte
+os anos já encerrados: cada ano é baixado uma única vez, com o filtro de datas no
+servidor, e depois só lido do cache (append-only; anos fechados não são re-verificados).
+Quem reescreve linhas antigas no banco chama `reset(tabela)` para o cache baixá-la de novo.
+"""
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from supabase_fetch import iter_pages, ensure_columns
+
+DEFAULT_CACHE_PATH = "relatorio_cache.sqlite"
+# Tamanho padrão da janela re-verificada a cada sincronização
+DEFAULT_TRAILING_DAYS = 45
+
+
+class SyncCache:
+    """Armazena cópias locais das tabelas e as mantém em dia de forma incremental."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, trailing_days=DEFAULT_TRAILING_DAYS):
+        self.path = path
+        self.trailing_days = trailing_days
+        # Uma conexão compartilhada entre as threads do FetchScheduler, serializada pelo lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS rows ("
+                " table_name TEXT NOT NULL, id NOT NULL, window_value, payload TEXT NOT NULL,"
+                " PRIMARY KEY (table_name, id))"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS rows_window ON rows (table_name, window_value)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS watermarks ("
+                " table_name TEXT PRIMARY KEY, max_id, synced_at TEXT NOT NULL, columns TEXT)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                " table_name TEXT NOT NULL, year INTEGER NOT NULL, id NOT NULL, payload TEXT NOT NULL,"
+                " PRIMARY KEY (table_name, year, id))"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS history_years ("
+                " table_name TEXT NOT NULL, year INTEGER NOT NULL, columns TEXT NOT NULL, synced_at TEXT NOT NULL,"
+                " PRIMARY KEY (table_name, year))"
+            )
+            existing = {row[1] for row in self.conn.execute("PRAGMA table_info(watermarks)")}
+            if "columns" not in existing:
+                self.conn.execute("ALTER TABLE watermarks ADD COLUMN columns TEXT")
+
+    def window_start(self):
+        """Início (YYYY-MM-DD) da janela recente que é sempre re-verificada."""
+        return (datetime.now() - timedelta(days=self.trailing_days)).strftime('%Y-%m-%d')
+
+    def get_watermark(self, table, columns="*"):
+        """Maior id em cache; None se a tabela nunca foi sincronizada com esta projeção de colunas."""
+        with self.lock:
+            row = self.conn.execute("SELECT max_id, columns FROM watermarks WHERE table_name = ?", (table,)).fetchone()
+            if row is None:
+                return None
+            if (row[1] or "*") != columns:
+                # Projeção mudou: as linhas em cache não têm as colunas pedidas, recomeça do zero
+                with self.conn:
+                    self.conn.execute("DELETE FROM rows WHERE table_name = ?", (table,))
+                    self.conn.execute("DELETE FROM watermarks WHERE table_name = ?", (table,))
+                return None
+        return row[0]
+
+    def _store(self, table, page, window_column):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO rows (table_name, id, window_value, payload) VALUES (?, ?, ?, ?)",
+            [(table, r["id"], r.get(window_column) if window_column else None, json.dumps(r)) for r in page],
+        )
+
+    def sync(self, client, table, columns="*", window_column=None, window_start=None, floor=None):
+        """
+        Atualiza o cache de `table` e retorna quantas linhas vieram da rede.
+
+        Sem `window_column` só as linhas novas (id > marca d'água) são buscadas. Com ela, as
+        linhas com `window_column >= window_start` também são re-baixadas e substituem as do
+        cache nessa faixa (valores comparados como texto ISO ou número, como vêm da API).
+        `floor` limita as buscas a `window_column >= floor` (ex.: o ano aberto de um log por data,
+        com os anos encerrados em `load_closed_years`, ou o período exibido pelo relatório); linhas
+        novas com data anterior ficam de fora, e as que já estavam no cache e ficaram abaixo dele saem.
+        """
+        columns = ensure_columns(columns, ("id", window_column) if window_column else ("id",))
+        watermark = self.get_watermark(table, columns)
+        recheck = watermark is not None and window_column and window_start is not None
+        floor_filter = [("gte", window_column, floor)] if window_column and floor is not None else []
+        if recheck and floor is not None:
+            window_start = max(window_start, floor)
+
+        # Rede fora do lock, para que outras tabelas sincronizem em paralelo
+        pages = []
+        if recheck:
+            pages.extend(iter_pages(client, table, columns=columns, filters=[("gte", window_column, window_start)]))
+        pages.extend(iter_pages(client, table, columns=columns, start_after=watermark, filters=floor_filter))
+
+        with self.lock, self.conn:
+            if recheck:
+                # Mesma faixa re-baixada acima: o que está nela e sumiu do banco sai do cache
+                self.conn.execute(
+                    "DELETE FROM rows WHERE table_name = ? AND window_value >= ?", (table, window_start)
+                )
+            if floor_filter:
+                self.conn.execute("DELETE FROM rows WHERE table_name = ? AND window_value < ?", (table, floor))
+            for page in pages:
+                self._store(table, page, window_column)
+
+            max_id = self.conn.execute("SELECT MAX(id) FROM rows WHERE table_name = ?", (table,)).fetchone()[0]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO watermarks (table_name, max_id, synced_at, columns) VALUES (?, ?, ?, ?)",
+                (table, max_id, datetime.now().isoformat(), columns),
+            )
+        return sum(len(page) for page in pages)
+
+    def iter_records(self, table, since=None, chunk_size=5000):
+        """Gera as linhas do cache em blocos (listas de dicts), ordenadas por id.
+
+        `since` restringe às linhas com valor da coluna de janela >= since.
+        """
+        sql = "SELECT id, payload FROM rows WHERE table_name = ?"
+        params = [table]
+        if since is not None:
+            sql += " AND window_value >= ?"
+            params.append(since)
+
+        last_id = None
+        while True:
+            # Keyset por id; cada bloco é lido com o lock e liberado antes do yield
+            page_sql, page_params = sql, list(params)
+            if last_id is not None:
+                page_sql += " AND id > ?"
+                page_params.append(last_id)
+            with self.lock:
+                batch = self.conn.execute(page_sql + " ORDER BY id LIMIT ?", page_params + [chunk_size]).fetchall()
+            if not batch:
+                return
+            yield [json.loads(payload) for (_, payload) in batch]
+            last_id = batch[-1][0]
+
+    def load_records(self, table, since=None):
+        return [row for chunk in self.iter_records(table, since=since) for row in chunk]
+
+    def load_dataframe(self, table, parse_dates=(), since=None):
+        """Monta o DataFrame da tabela em cache bloco a bloco, como em `fetch_dataframe`."""
+        chunks = []
+        for records in self.iter_records(table, since=since):
+            chunk = pd.DataFrame.from_records(records)
+            for col in parse_dates:
+                if col in chunk.columns:
+                    chunk[col] = pd.to_datetime(chunk[col])
+            chunks.append(chunk)
+        if not chunks:
+            return pd.DataFrame()
+        return pd.concat(chunks, ignore_index=True)
+
+    def sync_dataframe(self, client, table, columns="*", parse_dates=(), window_column=None, window_start=None, since=None):
+        """Sincroniza a tabela e a devolve como DataFrame (inteira, ou a partir de `since`)."""
+        fetched = self.sync(client, table, columns=columns, window_column=window_column, window_start=window_start)
+        print(f"  🔄 Cache '{table}': {fetched} linhas novas/alteradas baixadas.")
+        return self.load_dataframe(table, parse_dates=parse_dates, since=since)
+
+    def sync_records(self, client, table, columns="*", window_column=None, window_start=None, since=None, floor=None):
+        fetched = self.sync(client, table, columns=columns, window_column=window_column, window_start=window_start,
+                            floor=floor)
+        print(f"  🔄 Cache '{table}': {fetched} linhas novas/alteradas baixadas.")
+        return self.load_records(table, since=since)
+
+    def _cached_years(self, table, columns):
+        with self.lock:
+            rows = self.conn.execute("SELECT year, columns FROM history_years WHERE table_name = ?", (table,)).fetchall()
+        return {year for year, cached_columns in rows if cached_columns == columns}
+
+    def load_closed_years(self, client, table, date_column, years, columns="*"):
+        """
+        Linhas de `table` dos `years` (anos já encerrados), como lista de dicts ordenada por ano e id.
+
+        Anos ausentes do cache (ou gravados com outra projeção de colunas) são baixados com
+        `date_column` entre 1º de janeiro e o ano seguinte; os demais vêm só do SQLite.
+        """
+        columns = ensure_columns(columns, ("id", date_column))
+        current_year = datetime.now().year
+        years = sorted(set(years))
+        if any(year >= current_year for year in years):
+            raise ValueError(f"Só anos encerrados vão para o histórico (ano atual: {current_year})")
+
+        missing = [year for year in years if year not in self._cached_years(table, columns)]
+        for year in missing:
+            # Rede fora do lock; o ano só é marcado como sincronizado depois de gravado inteiro
+            filters = [("gte", date_column, f"{year}-01-01"), ("lt", date_column, f"{year + 1}-01-01")]
+            pages = list(iter_pages(client, table, columns=columns, filters=filters))
+            with self.lock, self.conn:
+                self.conn.execute("DELETE FROM history WHERE table_name = ? AND year = ?", (table, year))
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO history (table_name, year, id, payload) VALUES (?, ?, ?, ?)",
+                    [(table, year, r["id"], json.dumps(r)) for page in pages for r in page],
+                )
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO history_years (table_name, year, columns, synced_at) VALUES (?, ?, ?, ?)",
+                    (table, year, columns, datetime.now().isoformat()),
+                )
+        if missing:
+            print(f"  🗄️ Histórico '{table}': anos {', '.join(map(str, missing))} gravados no cache.")
+
+        if not years:
+            return []
+        placeholders = ", ".join("?" for _ in years)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT payload FROM history WHERE table_name = ? AND year IN ({placeholders}) ORDER BY year, id",
+                [table] + years,
+            ).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def reset(self, table):
+        """Descarta tudo o que há em cache de `table`; a próxima sincronização baixa a tabela inteira.
+
+        Para quem reescreve linhas antigas mantendo o id (ex.: backfill), que a marca d'água e a
+        janela recente não detectam.
+        """
+        with self.lock, self.conn:
+            for cache_table in ("rows", "watermarks", "history", "history_years"):
+                self.conn.execute(f"DELETE FROM {cache_table} WHERE table_name = ?", (table,))
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,131 @@
+"""Tabelas leves para as páginas do relatório.
+
+`ax.table` cria um Cell (Rectangle + Text) por célula, mede o texto de todas no layout
+e depois é estilizado célula a célula; com muitos hábitos ou exercícios é um dos
+artistas mais lentos de montar e exportar. `draw_table` recebe a grade já pronta
+(textos e cores em matrizes, montadas com fatias NumPy) e desenha:
+- fundo e bordas de todas as células em uma única PatchCollection;
+- os textos em um Text de várias linhas por coluna e estilo (cor, peso, alinhamento e
+  posição da base, que depende das letras), com o espaçamento entre linhas igual à altura
+  da linha da tabela, sem auto-layout: poucos artistas por coluna em vez de um por célula.
+A altura da linha vem do tamanho da fonte (como no ax.table) e a tabela fica centralizada
+na vertical do eixo, em coordenadas que acompanham o tight_layout.
+"""
+from functools import lru_cache
+
+import numpy as np
+from matplotlib.collections import PatchCollection
+from matplotlib.font_manager import FontProperties, fontManager, get_font
+from matplotlib.patches import Rectangle
+from matplotlib.textpath import text_to_path
+from matplotlib.transforms import ScaledTranslation, blended_transform_factory
+
+
+def format_percent(values, decimals=1):
+    """Coluna de números -> '12.3%' (vetorizado)."""
+    return np.char.mod(f'%.{decimals}f%%', np.asarray(values, dtype=float))
+
+
+def format_scaled(values, unit, decimals=2, small_decimals=0, empty=None):
+    """Coluna de números -> '1.23M kg' / '4.56k kg' / '789 kg' (vetorizado).
+
+    `empty` substitui os valores <= 0 (ex.: 'N/A').
+    """
+    values = np.asarray(values, dtype=float)
+    text = np.where(values >= 1_000_000, np.char.mod(f'%.{decimals}fM {unit}', values / 1_000_000),
+                    np.where(values >= 1000, np.char.mod(f'%.{decimals}fk {unit}', values / 1000),
+                             np.char.mod(f'%.{small_decimals}f {unit}', values)))
+    if empty is not None:
+        text = np.where(values > 0, text, empty)
+    return text.astype(object)
+
+
+def _font_metrics(font_size, weight):
+    """(ascendente, descendente) da fonte, em pontos, das tabelas OS/2 ou hhea, como o Text usa."""
+    font = get_font(fontManager.findfont(FontProperties(size=font_size, weight=weight)))
+    units_per_em = font.get_sfnt_table('head')['unitsPerEm']
+    for table_name, ascent_key, descent_key in (('OS/2', 'sTypoAscender', 'sTypoDescender'),
+                                                ('hhea', 'ascent', 'descent')):
+        table = font.get_sfnt_table(table_name)
+        if table is not None:
+            return table[ascent_key] / units_per_em * font_size, -table[descent_key] / units_per_em * font_size
+    return font_size * 0.95, font_size * 0.25
+
+
+@lru_cache(maxsize=None)
+def _glyph_extent(char, font_size, weight):
+    """(ascendente, descendente) da tinta de um caractere, em pontos."""
+    _, height, descent = text_to_path.get_text_width_height_descent(
+        char, FontProperties(size=font_size, weight=weight), ismath=False)
+    return height - descent, descent
+
+
+def _baseline_shift(line, font_size, weight, ascent, descent):
+    """Deslocamento (pontos, para cima) que leva a linha, centrada pela tinta numa linha de
+    `linespacing` numérico, à base de um ax.text de uma linha com va='center'.
+
+    A tinta da linha é a união da dos caracteres (medidos uma vez cada).
+    """
+    extents = [_glyph_extent(char, font_size, weight) for char in set(line)]
+    line_ascent = max(extent[0] for extent in extents)
+    line_descent = max(extent[1] for extent in extents)
+    return round(((line_ascent - line_descent) - (max(line_ascent, ascent) - max(line_descent, descent))) / 2, 2)
+
+
+def draw_table(ax, text, face_colors, text_colors, weights=None, col_widths=None, align='center',
+               font_size=8, row_scale=1.2, edge_color='black', linewidth=0.8):
+    """
+    Desenha a grade `text` (linhas × colunas, cabeçalhos incluídos) no eixo `ax`.
+
+    `face_colors`, `text_colors` e `weights` têm a forma de `text`; células com face None não
+    são desenhadas (ex.: canto vazio entre cabeçalho e rótulos). `col_widths` são frações da
+    largura do eixo (padrão: iguais, somando 1). `align` ('left', 'center', 'right') vale para
+    todas as células, é uma lista por coluna ou uma matriz com a forma de `text`.
+    """
+    text = np.asarray(text, dtype=object)
+    n_rows, n_cols = text.shape
+    face_colors = np.asarray(face_colors, dtype=object)
+    text_colors = np.broadcast_to(np.asarray(text_colors, dtype=object), text.shape)
+    weights = np.broadcast_to(np.asarray(weights if weights is not None else 'normal', dtype=object), text.shape)
+    widths = np.asarray(col_widths if col_widths is not None else [1 / n_cols] * n_cols, dtype=float)
+    aligns = np.broadcast_to(np.asarray(align, dtype=object), text.shape)
+
+    # x em fração do eixo; y em polegadas a partir do meio do eixo, para a altura da linha
+    # depender só da fonte (mesma regra do ax.table) e sobreviver ao tight_layout
+    fig = ax.figure
+    transform = blended_transform_factory(ax.transAxes, fig.dpi_scale_trans + ScaledTranslation(0, 0.5, ax.transAxes))
+    row_height = font_size / 72 * 1.2 * row_scale
+    lefts = np.concatenate([[0.0], np.cumsum(widths)[:-1]])
+    tops = n_rows * row_height / 2 - np.arange(n_rows) * row_height
+
+    # autolim=False: a grade não mexe nos limites de dados (títulos em ax.text continuam no lugar)
+    rows, cols = np.nonzero(face_colors != None)  # noqa: E711 (comparação elemento a elemento)
+    cells = [Rectangle((lefts[j], tops[i] - row_height), widths[j], row_height) for i, j in zip(rows, cols)]
+    ax.add_collection(PatchCollection(cells, facecolors=list(face_colors[rows, cols]), edgecolors=edge_color,
+                                      linewidths=linewidth, transform=transform), autolim=False)
+
+    pad = 0.1  # fração da largura da coluna, como o PAD do matplotlib.table.Cell
+    anchors = {'left': lambda j: lefts[j] + pad * widths[j], 'center': lambda j: lefts[j] + widths[j] / 2,
+               'right': lambda j: lefts[j] + (1 - pad) * widths[j]}
+    # Um Text de várias linhas por (coluna, cor, peso, alinhamento, deslocamento da base): as linhas de
+    # outros grupos ficam em branco, então cada linha cai na sua célula
+    metrics = {weight: _font_metrics(font_size, weight) for weight in np.unique(weights)}
+    for j in range(n_cols):
+        groups = {}
+        for i in range(n_rows):
+            if text[i, j] is None or text[i, j] == '':
+                continue
+            line, weight = str(text[i, j]), weights[i, j]
+            shift = _baseline_shift(line, font_size, weight, *metrics[weight])
+            key = (text_colors[i, j], weight, aligns[i, j], shift)
+            groups.setdefault(key, [''] * n_rows)[i] = line
+        for (color, weight, cell_align, shift), lines in groups.items():
+            first = next(i for i, line in enumerate(lines) if line)
+            last = max(i for i, line in enumerate(lines) if line)
+            ascent, descent = metrics[weight]
+            # Com linespacing numérico toda linha ocupa a mesma altura (row_height), a partir do topo da
+            # primeira célula do grupo
+            ax.text(anchors[cell_align](j), tops[first] + shift / 72, '\n'.join(lines[first:last + 1]),
+                    transform=transform, ha=cell_align, va='top', fontsize=font_size, color=color, fontweight=weight,
+                    linespacing=row_height * 72 / (ascent + descent))
+    ax.axis('off')
@@ -0,0 +1,148 @@
+"""Backends de aggregates.py contra o caminho pandas do relatório, com os dados sintéticos do backend offline.
+
+SQLiteAggregates (o mesmo SQL das views) e RollupAggregates (resumo persistido pelo
+atualizar_db_finance.py) têm de devolver o que o FinanceReport e o HabitTracker calculam
+a partir das tabelas brutas.
+"""
+import copy
+from datetime import datetime, timedelta
+
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import pandas as pd
+import pytest
+
+import atualizar_db_finance
+from aggregates import RollupAggregates, SQLiteAggregates, SupabaseAggregates
+from cashflow import DailyCashflow
+from finance_pivot import MonthlyPivot
+from finance_schema import finance_frame, typed_frame
+from habit_matrix import HabitAggregateStats, HabitMatrix
+from relat_cons import FinanceReport
+from supabase_offline import OfflineClient, VIEW_SOURCE_TABLES, synthetic_fixtures
+
+
+@pytest.fixture(scope="module")
+def fixtures():
+    return synthetic_fixtures(days=500, seed=1)
+
+
+@pytest.fixture
+def sqlite(fixtures):
+    return SQLiteAggregates.from_records({table: fixtures[table] for table in VIEW_SOURCE_TABLES})
+
+
+@pytest.fixture
+def client(fixtures, monkeypatch):
+    """Cliente offline com uma cópia das fixtures, usado também pelo atualizar_db_finance."""
+    client = OfflineClient(copy.deepcopy(fixtures))
+    monkeypatch.setattr(atualizar_db_finance, "supabase", client)
+    return client
+
+
+def raw_frame(fixtures, table):
+    return typed_frame(pd.DataFrame.from_records(fixtures[table]), table)
+
+
+def raw_monthly_debt(fixtures):
+    """Último saldo de cc_e_dividas de cada mês, como no gráfico de dívida (reais)."""
+    debt = raw_frame(fixtures, "cc_e_dividas")
+    return debt.groupby(debt["data_registro"].dt.to_period("M"))["valor_centavos"].last() / 100
+
+
+def raw_reserve_balance(fixtures):
+    """Saldo acumulado da reserva no fim de cada mês, como no gráfico de reserva (reais)."""
+    reserve = raw_frame(fixtures, "reserva").sort_values("data_registro")
+    balance = reserve["valor_centavos"].cumsum() / 100
+    return balance.groupby(reserve["data_registro"].dt.to_period("M")).last()
+
+
+def by_month(df, column):
+    return df.set_index("mes")[column].astype(float).rename_axis(None)
+
+
+def assert_finance_matches_raw(backend, fixtures):
+    pivot = MonthlyPivot.from_frame(raw_frame(fixtures, "financ_regis"))
+    aggregated = MonthlyPivot.from_aggregates(backend.monthly_totals())
+    pd.testing.assert_frame_equal(aggregated.total, pivot.total, check_names=False)
+    pd.testing.assert_frame_equal(aggregated.total_abs, pivot.total_abs, check_names=False)
+
+    pd.testing.assert_series_equal(by_month(backend.monthly_debt(), "valor"), raw_monthly_debt(fixtures).rename_axis(None),
+                                   check_names=False)
+    pd.testing.assert_series_equal(by_month(backend.reserve_balance(), "saldo"),
+                                   raw_reserve_balance(fixtures).rename_axis(None), check_names=False)
+
+    report = FinanceReport("u", "k", client=OfflineClient({}))
+    today = datetime.now()
+    raw_invoices = report._future_invoices({"parcelas_df": raw_frame(fixtures, "compras_prazo_parcelas")}, today)
+    invoices = report._future_invoices({"unpaid_installments": backend.unpaid_installments()}, today)
+    assert not raw_invoices.empty
+    pd.testing.assert_series_equal(invoices.astype(float), raw_invoices, check_names=False, check_freq=False)
+
+    # Fluxo diário: somas por (dia, tipo_id) desde o início da janela do gráfico
+    entrada_id = next(t["id"] for t in fixtures["tipo"] if t["nome_tipo"].lower() == "entradas")
+    since = FinanceReport.cashflow_start(today)
+    raw_cashflow = DailyCashflow.from_frame(finance_frame(pd.DataFrame.from_records(fixtures["financ_regis"]), entrada_id))
+    cashflow = DailyCashflow.from_aggregates(backend.daily_totals(since=since.strftime("%Y-%m-%d")), entrada_id)
+    pd.testing.assert_frame_equal(cashflow.series(since, today), raw_cashflow.series(since, today))
+    assert cashflow.burn_rate(today) == raw_cashflow.burn_rate(today)
+    assert cashflow.month_to_date(today) == raw_cashflow.month_to_date(today)
+
+
+def test_sqlite_finance_aggregates_match_raw_frames(sqlite, fixtures):
+    assert_finance_matches_raw(sqlite, fixtures)
+
+
+def test_rollup_matches_raw_frames_after_rebuild(client, fixtures):
+    atualizar_db_finance.reconstruir_resumo(concorrente=False)
+    assert_finance_matches_raw(RollupAggregates(client), fixtures)
+
+
+def test_rollup_daily_job_picks_up_late_entries(client):
+    """Lançamento atrasado no mês anterior: o job diário deixa o resumo igual à reconstrução completa."""
+    atualizar_db_finance.reconstruir_resumo(concorrente=False)
+    last_month = (datetime.now().replace(day=1) - timedelta(days=3)).date().isoformat()
+    client.table("financ_regis").insert([
+        {"valor": -777.0, "nome": "Atrasado", "tipo_id": 3, "data_registro": last_month},
+        {"valor": -5.0, "nome": "Categoria nova", "tipo_id": 99, "data_registro": last_month},
+    ]).execute()
+
+    atualizar_db_finance.main(concorrente=False, resumo=True)
+    incremental = RollupAggregates(client)
+    results = {name: getattr(incremental, name)() for name in
+               ("monthly_totals", "monthly_debt", "reserve_balance", "unpaid_installments")}
+
+    atualizar_db_finance.reconstruir_resumo(concorrente=False)
+    rebuilt = RollupAggregates(client)
+    for name, df in results.items():
+        pd.testing.assert_frame_equal(df, getattr(rebuilt, name)(), obj=name)
+    assert_finance_matches_raw(incremental, client.tables)
+
+
+def test_report_cashflow_with_server_aggregates_matches_raw(client):
+    """Com server_aggregates o gráfico diário sai da view financ_regis_diario, com os mesmos valores."""
+    today = datetime.now()
+    raw = FinanceReport("u", "k", client=client).fetch_all_data()["cashflow"]
+    aggregated = FinanceReport("u", "k", client=client, aggregates=SupabaseAggregates(client)).fetch_all_data()["cashflow"]
+    start = FinanceReport.cashflow_start(today)
+    assert len(aggregated) > 0
+    pd.testing.assert_frame_equal(aggregated.series(start, today), raw.series(start, today))
+
+
+def test_sqlite_habit_aggregates_match_matrix(sqlite, fixtures):
+    today = pd.Timestamp.now().normalize()
+    year = today.year
+    habits = [habit for habit in fixtures["habitos"] if habit["ativo"]]
+    matrix = HabitMatrix.from_records(habits, fixtures["habitos_registros"], year, first_year=year - 1)
+    stats = HabitAggregateStats.from_aggregates(habits, sqlite.habit_monthly(since=f"{year}-01-01"), year,
+                                                daily=sqlite.habit_daily(since=(today - timedelta(days=364)).isoformat()))
+
+    pd.testing.assert_frame_equal(stats.monthly_rates(), matrix.monthly_rates())
+    np.testing.assert_array_equal(np.array(list(stats.overall_monthly_rates().values())),
+                                  np.array(list(matrix.overall_monthly_rates().values())))
+    for month in range(1, 13):
+        pd.testing.assert_series_equal(stats.rates(month), matrix.rates(month))
+        assert stats.month_completed(month) == matrix.month_completed(month)
+    pd.testing.assert_series_equal(stats.daily_completion(today, 365), matrix.daily_completion(today, 365),
+                                   check_freq=False)
@@ -0,0 +1,72 @@
+"""Job de atualização (atualizar_db_finance.py) contra o backend offline com os dados sintéticos."""
+import copy
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import atualizar_db_finance
+from supabase_offline import OfflineClient, synthetic_fixtures
+
+
+@pytest.fixture(scope="module")
+def fixtures():
+    return synthetic_fixtures(days=500, seed=1)
+
+
+@pytest.fixture
+def client(fixtures, monkeypatch):
+    client = OfflineClient(copy.deepcopy(fixtures))
+    monkeypatch.setattr(atualizar_db_finance, "supabase", client)
+    return client
+
+
+def rows_on(client, table, day):
+    return [row for row in client.tables[table] if row["data_registro"] == day]
+
+
+def reserve_balance(client):
+    """Saldo acumulado da reserva no fim de cada mês (centavos), como no relatório e no resumo."""
+    reserve = pd.DataFrame.from_records(client.tables["reserva"]).sort_values("data_registro", kind="mergesort")
+    balance = (reserve["valor"] * 100).round().astype("int64").cumsum()
+    return balance.groupby(pd.to_datetime(reserve["data_registro"]).dt.to_period("M")).last()
+
+
+def test_core_writes_survive_missing_rollup_tables(client):
+    """Sem as tabelas do resumo (sql/resumo_mensal.sql não aplicado), dívida e reserva do dia são gravadas."""
+    del client.tables["resumo_mensal"], client.tables["resumo_mensal_tipo"]
+    atualizar_db_finance.main(concorrente=False, resumo=True)
+
+    today = date.today().isoformat()
+    assert len(rows_on(client, "cc_e_dividas", today)) == 1
+    assert len(rows_on(client, "reserva", today)) == 1
+
+
+def test_rollup_skipped_without_writable_key(client, monkeypatch):
+    """Sem chave que grave o resumo, o job não tenta reconstruí-lo (nem lê as tabelas brutas inteiras)."""
+    monkeypatch.setattr(atualizar_db_finance, "reconstruir_resumo", lambda *args, **kwargs: pytest.fail("reconstruiu"))
+    monkeypatch.setattr(atualizar_db_finance, "SUPABASE_SERVICE_ROLE_KEY", None)
+    monkeypatch.delenv("SUPABASE_BACKEND", raising=False)
+    atualizar_db_finance.main(concorrente=False)
+
+    assert client.tables["resumo_mensal"] == []
+    assert len(rows_on(client, "cc_e_dividas", date.today().isoformat())) == 1
+
+
+@pytest.mark.parametrize("prune", [False, True])
+def test_backfill_keeps_reserve_balance(client, prune):
+    """Nas fixtures a reserva já segue o modelo (1000 por mês): o backfill não pode mudar o saldo, nem repetido."""
+    last_month = pd.Period(date.today(), freq="M") - 1
+    before = reserve_balance(client)
+
+    for _ in range(2):
+        historico = atualizar_db_finance.backfill(str(last_month - 11), str(last_month), concorrente=False,
+                                                  prune=prune, cache_path=None)
+        pd.testing.assert_series_equal(reserve_balance(client), before)
+    assert (historico["reserva"] == 100000).all()
+
+    # Com prune, só a linha do fim de cada mês; sem, as linhas do dia 1 continuam ao lado dela
+    month_ends = {((month + 1).start_time - pd.Timedelta(days=1)).date().isoformat() for month in historico.index}
+    in_period = {row["data_registro"] for row in client.tables["reserva"]
+                 if str(last_month - 11) <= row["data_registro"][:7] <= str(last_month)}
+    assert (in_period == month_ends) if prune else (in_period > month_ends)
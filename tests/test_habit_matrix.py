@@ -0,0 +1,44 @@
+"""HabitMatrix.streaks com uma matriz montada à mão."""
+import pandas as pd
+
+from habit_matrix import HabitMatrix
+
+TODAY = pd.Timestamp("2025-03-10")
+WINDOW_START = pd.Timestamp("2025-02-20")
+
+
+def days(first, last):
+    return [day.date().isoformat() for day in pd.date_range(first, last)]
+
+
+def matrix(done_days):
+    habits = [{"id": habit_id, "nome": f"H{habit_id}"} for habit_id in done_days]
+    registros = [{"habito_id": habit_id, "data_registro": day, "nivel": 1}
+                 for habit_id, habit_days in done_days.items() for day in habit_days]
+    return HabitMatrix.from_records(habits, registros, 2025)
+
+
+def test_streaks_within_window():
+    streaks = matrix({
+        # Termina hoje; a sequência de 20 dias de janeiro fica fora da janela
+        1: days("2025-01-01", "2025-01-20") + days("2025-03-01", "2025-03-03") + days("2025-03-06", "2025-03-10"),
+        # Termina ontem: ainda é a sequência atual
+        2: days("2025-03-05", "2025-03-09"),
+        # Pausa inicial (do início da janela até 1/3) não conta; a que chega até hoje é `sem_fazer`
+        3: ["2025-03-01", "2025-03-05"],
+        # Sequência que começa antes da janela conta só a parte de dentro
+        4: days("2025-02-15", "2025-02-25"),
+    }).streaks(TODAY, start=WINDOW_START)
+
+    assert streaks["atual"].to_dict() == {1: 5, 2: 5, 3: 0, 4: 0}
+    assert streaks["recorde"].to_dict() == {1: 5, 2: 5, 3: 1, 4: 6}
+    assert streaks["maior_pausa"].to_dict() == {1: 2, 2: 0, 3: 3, 4: 0}
+    assert streaks["sem_fazer"].to_dict() == {1: 0, 2: 1, 3: 5, 4: 13}
+    assert streaks.at[1, "pausa_media"] == 2
+
+
+def test_streaks_default_window_is_whole_matrix():
+    streaks = matrix({1: days("2025-01-01", "2025-01-20") + days("2025-03-06", "2025-03-10")}).streaks(TODAY)
+
+    assert streaks.at[1, "recorde"] == 20
+    assert streaks.at[1, "maior_pausa"] == 44
@@ -0,0 +1,41 @@
+"""HabitTracker com e sem o cache local, contra o backend offline com os dados sintéticos."""
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from relat_cons import HabitTracker
+from supabase_offline import OfflineClient, synthetic_fixtures
+from sync_cache import SyncCache
+
+
+@pytest.fixture(scope="module")
+def client():
+    return OfflineClient(synthetic_fixtures(days=800, seed=2))
+
+
+def habit_data(tracker):
+    habits, registros, _ = tracker.fetch_all_data()
+    return habits, registros
+
+
+def test_cached_registros_match_uncached(client, tmp_path):
+    """Anos encerrados vêm inteiros do cache, mas a matriz e o ranking têm de ser os do caminho sem cache."""
+    year = datetime.now().year
+    habits, expected = habit_data(HabitTracker("u", "k", client=client))
+    uncached = HabitTracker("u", "k", client=client).habit_matrix(habits, expected, year)
+
+    cache = SyncCache(str(tmp_path / "cache.sqlite"))
+    try:
+        for _ in range(2):  # frio e depois incremental
+            tracker = HabitTracker("u", "k", client=client, cache=cache)
+            _, registros = habit_data(tracker)
+            assert sorted(r["id"] for r in registros) == sorted(r["id"] for r in expected)
+            cached = tracker.habit_matrix(habits, registros, year)
+            np.testing.assert_array_equal(cached.done, uncached.done)
+            np.testing.assert_array_equal(cached.levels, uncached.levels)
+            today = datetime.now()
+            days = tracker.streak_days()
+            assert tracker.calculate_streaks(cached, today, days).equals(tracker.calculate_streaks(uncached, today, days))
+    finally:
+        cache.close()
@@ -0,0 +1,30 @@
+"""Backend offline: views sobre tabelas vazias e gravação de fixtures."""
+import json
+
+import pytest
+from postgrest.exceptions import APIError
+
+from supabase_offline import FIXTURE_TABLES, OPTIONAL_FIXTURE_TABLES, VIEW_QUERIES, OfflineClient, record_fixtures
+
+
+@pytest.mark.parametrize("view", sorted(VIEW_QUERIES))
+def test_views_over_empty_tables_are_empty(view):
+    client = OfflineClient({"financ_regis": [], "reserva": []})
+    assert client.table(view).select("*").execute().data == []
+
+
+def test_record_fixtures_skips_missing_rollup_tables(tmp_path):
+    """Projeto sem sql/resumo_mensal.sql: grava as demais tabelas em vez de falhar."""
+    project = OfflineClient({table: [{"id": 1}] for table in FIXTURE_TABLES if table not in OPTIONAL_FIXTURE_TABLES})
+    path = tmp_path / "fixtures.json"
+    record_fixtures(project, str(path))
+
+    with open(path, encoding="utf-8") as f:
+        recorded = json.load(f)
+    assert set(recorded) == set(FIXTURE_TABLES) - OPTIONAL_FIXTURE_TABLES
+
+
+def test_record_fixtures_still_fails_on_missing_required_table(tmp_path):
+    project = OfflineClient({"tipo": []})
+    with pytest.raises(APIError):
+        record_fixtures(project, str(tmp_path / "fixtures.json"))
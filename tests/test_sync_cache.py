@@ -0,0 +1,153 @@
+"""SyncCache contra o backend offline: marca d'água, janela re-verificada, piso, anos encerrados e reset."""
+import copy
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pytest
+
+import atualizar_db_finance
+from supabase_exec import STATS
+from supabase_offline import OfflineClient, synthetic_fixtures
+from sync_cache import SyncCache
+
+
+def day(days_ago):
+    return (date.today() - timedelta(days=days_ago)).isoformat()
+
+
+@pytest.fixture
+def client():
+    # ids 1..6: dois registros antigos (fora da janela de 10 dias) e quatro recentes
+    ages = [100, 60, 9, 5, 2, 0]
+    return OfflineClient({"reserva": [{"id": i, "valor": float(i), "data_registro": day(age)}
+                                      for i, age in enumerate(ages, start=1)]})
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SyncCache(str(tmp_path / "cache.sqlite"), trailing_days=10)
+    yield cache
+    cache.close()
+
+
+def sync(cache, client, **kwargs):
+    return cache.sync(client, "reserva", window_column="data_registro", window_start=cache.window_start(), **kwargs)
+
+
+def cached(cache):
+    return {row["id"]: row for row in cache.load_records("reserva")}
+
+
+def test_incremental_sync_fetches_only_new_rows(cache, client):
+    assert sync(cache, client) == 6
+    assert cache.get_watermark("reserva", "*") == 6
+
+    client.tables["reserva"].append({"id": 7, "valor": 7.0, "data_registro": day(0)})
+    # Janela re-baixada (ids 3..7) mais nada acima da marca d'água além do 7, que já veio na janela
+    assert sync(cache, client) == 5 + 1
+    assert sorted(cached(cache)) == [1, 2, 3, 4, 5, 6, 7]
+    assert cache.get_watermark("reserva", "*") == 7
+
+
+def test_recheck_refreshes_edits_and_deletions_in_window(cache, client):
+    sync(cache, client)
+    rows = {row["id"]: row for row in client.tables["reserva"]}
+    rows[1]["valor"] = -1.0  # fora da janela: o cache não vê a edição (por isso o reset)
+    rows[4]["valor"] = -4.0
+    client.tables["reserva"].remove(rows[5])
+
+    sync(cache, client)
+    result = cached(cache)
+    assert result[1]["valor"] == 1.0
+    assert result[4]["valor"] == -4.0
+    assert 5 not in result
+
+
+def test_floor_limits_fetches_and_drops_older_rows(cache, client):
+    sync(cache, client)
+    assert sorted(cached(cache)) == [1, 2, 3, 4, 5, 6]
+
+    # Piso acima do início da janela: a re-verificação também começa nele
+    assert sync(cache, client, floor=day(5)) == 3
+    assert sorted(cached(cache)) == [4, 5, 6]
+
+    # Sincronização fria com piso: linhas mais antigas nem são baixadas
+    cache.reset("reserva")
+    assert sync(cache, client, floor=day(60)) == 5
+    assert sorted(cached(cache)) == [2, 3, 4, 5, 6]
+
+
+def test_projection_change_starts_over(cache, client):
+    cache.sync(client, "reserva", columns="id, valor")
+    assert set(cache.load_records("reserva")[0]) == {"id", "valor"}
+
+    assert cache.sync(client, "reserva", columns="id, valor, data_registro") == 6
+    assert all(set(row) == {"id", "valor", "data_registro"} for row in cache.load_records("reserva"))
+
+
+def test_closed_years_are_fetched_once(cache):
+    year = datetime.now().year
+    client = OfflineClient({"habitos_registros": [
+        {"id": 1, "habito_id": 1, "data_registro": f"{year - 2}-06-01"},
+        {"id": 2, "habito_id": 1, "data_registro": f"{year - 1}-12-31"},
+        {"id": 3, "habito_id": 1, "data_registro": f"{year}-01-01"},
+    ]})
+
+    STATS.reset()
+    first = cache.load_closed_years(client, "habitos_registros", "data_registro", [year - 2, year - 1])
+    assert [row["id"] for row in first] == [1, 2]
+    assert STATS.snapshot()["habitos_registros"]["rows"] == 2
+
+    STATS.reset()
+    client.tables["habitos_registros"].append({"id": 4, "habito_id": 2, "data_registro": f"{year - 1}-03-01"})
+    assert cache.load_closed_years(client, "habitos_registros", "data_registro", [year - 2, year - 1]) == first
+    assert "habitos_registros" not in STATS.snapshot()
+
+    # Depois do reset o ano é baixado de novo, com a linha nova
+    cache.reset("habitos_registros")
+    again = cache.load_closed_years(client, "habitos_registros", "data_registro", [year - 1])
+    assert sorted(row["id"] for row in again) == [2, 4]
+
+    with pytest.raises(ValueError):
+        cache.load_closed_years(client, "habitos_registros", "data_registro", [year])
+
+
+def test_reset_discards_table(cache, client):
+    sync(cache, client)
+    client.tables["reserva"][0]["valor"] = -1.0
+    cache.reset("reserva")
+
+    assert cache.get_watermark("reserva", "*") is None
+    assert cache.load_records("reserva") == []
+    assert sync(cache, client) == 6
+    assert cached(cache)[1]["valor"] == -1.0
+
+
+def test_backfill_resets_report_cache(tmp_path, monkeypatch):
+    """O backfill reescreve linhas antigas com o mesmo id: a próxima sincronização tem de vê-las."""
+    client = OfflineClient(copy.deepcopy(synthetic_fixtures(days=300, seed=3)))
+    monkeypatch.setattr(atualizar_db_finance, "supabase", client)
+    path = str(tmp_path / "cache.sqlite")
+    tables = ("cc_e_dividas", "reserva")
+
+    def rows(records):
+        return sorted((row["id"], row["valor"], row["data_registro"]) for row in records)
+
+    # Saldos errados no fim do último mês do período, já no cache: o backfill os corrige no mesmo id
+    last_month = pd.Period(date.today(), freq="M") - 3
+    month_end = ((last_month + 1).start_time - pd.Timedelta(days=1)).date().isoformat()
+    for table in tables:
+        client.table(table).insert({"valor": 123456.0, "data_registro": month_end}).execute()
+
+    cache = SyncCache(path)
+    try:
+        for table in tables:
+            cache.sync(client, table, window_column="data_registro", window_start=cache.window_start())
+
+        atualizar_db_finance.backfill(str(last_month - 5), str(last_month), concorrente=False, cache_path=path)
+
+        for table in tables:
+            cache.sync(client, table, window_column="data_registro", window_start=cache.window_start())
+            assert rows(cache.load_records(table)) == rows(client.tables[table]), table
+    finally:
+        cache.close()
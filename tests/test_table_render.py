@@ -0,0 +1,60 @@
+"""draw_table: textos agrupados por coluna caem onde um ax.text por célula cairia."""
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from table_render import draw_table, format_percent
+
+
+def line_positions(ax, renderer):
+    """{(texto, x): y} da base de cada linha desenhada no eixo, em pixels."""
+    positions = {}
+    for artist in ax.texts:
+        x0, y0 = artist._get_xy_display()
+        for line, _, (x, y) in artist._get_layout(renderer)[1]:
+            if line:
+                positions[(line, round(x0 + x))] = y0 + y
+    return positions
+
+
+@pytest.mark.parametrize("font_size, row_scale", [(8, 1.2), (7.5, 1.25)])
+def test_batched_text_matches_one_text_per_cell(font_size, row_scale):
+    rng = np.random.default_rng(0)
+    text = np.empty((8, 5), dtype=object)
+    text[0, 1:] = ["Jan", "Feb", "Mar", "Geral"]
+    text[1:, 0] = ["Meditação", "Leitura", "Inglês", "Sem açúcar", "Jg", "Ú", "x"]
+    text[1:, 1:] = format_percent(rng.uniform(0, 100, (7, 4)))
+    text[2, 2] = ""
+    face = np.full(text.shape, "#161b22", dtype=object)
+    face[0, 0] = None
+    colors = np.full(text.shape, "#f0f6fc", dtype=object)
+    colors[:, 2] = "white"
+    weights = np.full(text.shape, "normal", dtype=object)
+    weights[0, :] = weights[:, 0] = weights[:, 2] = "bold"
+    align = np.full(text.shape, "center", dtype=object)
+    align[1:, 0] = "left"
+
+    fig, ax = plt.subplots(figsize=(6, 3), dpi=100)
+    draw_table(ax, text, face, colors, weights, align=align, font_size=font_size, row_scale=row_scale)
+    fig.canvas.draw()
+    batched = line_positions(ax, fig.canvas.get_renderer())
+    assert len(ax.texts) < np.count_nonzero(text != "") / 2
+
+    # Referência: um ax.text por célula, centrado nela, como o ax.table (colunas de larguras iguais)
+    reference = fig.add_axes(ax.get_position())
+    row_height = font_size / 72 * 1.2 * row_scale
+    width = 1 / text.shape[1]
+    anchors = {"left": 0.1 * width, "center": width / 2}
+    for i, j in zip(*np.nonzero(text != "")):
+        reference.text(j * width + anchors[align[i, j]], len(text) * row_height / 2 - (i + 0.5) * row_height,
+                       text[i, j], transform=ax.texts[0].get_transform(), ha=align[i, j], va="center",
+                       fontsize=font_size, color=colors[i, j], fontweight=weights[i, j])
+    fig.canvas.draw()
+    expected = line_positions(reference, fig.canvas.get_renderer())
+    plt.close(fig)
+
+    assert batched.keys() == expected.keys()
+    for key, y in expected.items():
+        assert batched[key] == pytest.approx(y, abs=0.5), key
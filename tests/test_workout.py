@@ -0,0 +1,34 @@
+"""WorkoutReport com e sem o cache local, contra o backend offline com os dados sintéticos."""
+import pytest
+
+from relat_cons import WorkoutReport
+from supabase_exec import STATS
+from supabase_offline import OfflineClient, synthetic_fixtures
+from sync_cache import SyncCache
+
+
+@pytest.fixture(scope="module")
+def client():
+    return OfflineClient(synthetic_fixtures(days=800, seed=1))
+
+
+def fetch_sets(client, cache=None):
+    """Séries do período exibido e bytes de registros_treino baixados para elas."""
+    STATS.reset()
+    report = WorkoutReport("u", "k", cache=cache, client=client)
+    sets = report.fetch_jobs()["workout:treinos"]()
+    return sets, STATS.snapshot()["registros_treino"]["bytes"]
+
+
+def test_cold_cache_fetches_only_the_displayed_period(client, tmp_path):
+    raw_sets, raw_bytes = fetch_sets(client)
+    cache = SyncCache(str(tmp_path / "cache.sqlite"))
+    try:
+        cached_sets, cached_bytes = fetch_sets(client, cache)
+    finally:
+        cache.close()
+
+    assert cached_bytes <= raw_bytes
+    key = ["registro_treino_id", "exercicio_id", "peso", "repeticoes"]
+    assert (sorted(map(tuple, cached_sets[key].to_numpy().tolist()))
+            == sorted(map(tuple, raw_sets[key].to_numpy().tolist())))
@@ -0,0 +1,43 @@
+"""Tabela ordenada por data com recorte de períodos por busca binária.
+
+Filtrar um período com máscara booleana (`(df.data >= ini) & (df.data <= fim)`) varre e
+aloca a coluna inteira a cada consulta. `TimeTable` ordena as linhas pela coluna de data
+uma única vez e responde cada período com dois `searchsorted` (O(log n)) e um `iloc`
+contíguo, que o pandas devolve como fatia sem copiar os dados. As fatias são somente
+leitura por convenção: quem precisar alterar colunas faz `.copy()`.
+"""
+import numpy as np
+import pandas as pd
+
+
+class TimeTable:
+    """DataFrame ordenado por `column` (datetime64, com ou sem fuso) com consultas por período."""
+
+    def __init__(self, df, column):
+        self.column = column
+        # mergesort é estável: linhas da mesma data mantêm a ordem original (ex.: por id)
+        self.df = df.sort_values(column, kind='mergesort').reset_index(drop=True) if len(df) else df
+        dates = pd.to_datetime(self.df[column]) if len(self.df) else pd.Series([], dtype='datetime64[ns]')
+        self.tz = getattr(dates.dt, 'tz', None)
+        # Chaves em ns desde a época (UTC quando a coluna tem fuso), para comparar com os limites
+        self._keys = dates.array.asi8 if len(dates) else np.array([], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.df)
+
+    def _key(self, moment):
+        moment = pd.Timestamp(moment)
+        if self.tz is not None:
+            moment = moment.tz_localize(self.tz) if moment.tzinfo is None else moment.tz_convert(self.tz)
+        elif moment.tzinfo is not None:
+            moment = moment.tz_convert(None)
+        return moment.as_unit('ns').value
+
+    def between(self, start=None, end=None, inclusive_end=True):
+        """Linhas com start <= data <= end (ou < end se inclusive_end=False); limites None são abertos."""
+        lo = 0 if start is None else np.searchsorted(self._keys, self._key(start), side='left')
+        if end is None:
+            hi = len(self._keys)
+        else:
+            hi = np.searchsorted(self._keys, self._key(end), side='right' if inclusive_end else 'left')
+        return self.df.iloc[lo:max(lo, hi)]